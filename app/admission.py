@@ -0,0 +1,170 @@
+"""Control de admisión para el trabajo caro sin cache (listados completos y búsquedas).
+
+Las rutas declaran su clase con ``dependencies=[Depends(search_admission)]``;
+la dependencia solo anota la clase, la ruta y el cliente en la solicitud. Los
+límites se aplican en las funciones CRUD con ``with admitted():`` alrededor
+de la consulta a la base, después de que fallaron el snapshot, el 304 y el
+cache: las lecturas servidas desde cache nunca se limitan.
+
+  - Concurrencia por ruta y por worker: como mucho N consultas a la vez; las
+    demás esperan hasta ADMISSION_QUEUE_MS y, si no hay lugar, reciben 503.
+  - Token bucket en Redis por cliente (compartido por todos los workers):
+    ``rate`` consultas por segundo con ráfagas de hasta ``burst``; al
+    agotarse, 429. Si Redis no responde, se deja pasar (falla abierta).
+
+El cliente es la IP de la conexión o, con RATE_LIMIT_TRUST_FORWARDED=true (el
+valor de la imagen Docker, detrás del ingress), la primera de X-Forwarded-For.
+Fuera de una ruta con admisión (CLI, lotes por ID) ``admitted()`` no hace nada.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from app.cache.admin import redis_connection
+from app.cache.cache_utils import redis_breaker
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_QUEUE_MS = float(os.getenv("ADMISSION_QUEUE_MS", "100"))
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_TRUST_FORWARDED = (
+    os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+)
+
+# Token bucket: {t = tokens, ts = última recarga en ms}; devuelve {permitido, espera_ms}
+_TOKEN_BUCKET = redis_connection.register_script("""
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, wait}
+""")
+
+
+def client_id(request: Request) -> str:
+    """IP del cliente (la primera de X-Forwarded-For si se confía en el proxy)."""
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "desconocido"
+
+
+class Admission:
+    """Clase de rutas con sus límites; como dependencia anota la solicitud actual."""
+
+    def __init__(self, name: str, concurrency: int, rate: float, burst: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, route: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(route)
+            if semaphore is None:
+                semaphore = self._semaphores[route] = threading.BoundedSemaphore(
+                    self.concurrency
+                )
+            return semaphore
+
+    def _take_token(self, client: str) -> int:
+        """0 si hay token; si no, los ms hasta el próximo."""
+        result = redis_breaker.call(
+            _TOKEN_BUCKET,
+            keys=[f"ratelimit:{self.name}:{client}"],
+            args=[self.rate, self.burst, int(time.time() * 1000)],
+        )
+        if result is None:
+            return 0
+        allowed, wait_ms = result
+        return 0 if int(allowed) else max(int(wait_ms), 1)
+
+    @staticmethod
+    def _reject(route: str, code: int, motivo: str, retry_after: float):
+        registry.inc("admission_rejected_total", ruta=route, motivo=motivo)
+        logger.warning("Admisión › %s rechazada (%s)", route, motivo)
+        raise HTTPException(
+            status_code=code,
+            detail="Demasiadas solicitudes, intente nuevamente en unos segundos",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    @contextmanager
+    def admit(self, route: str, client: str) -> Iterator[None]:
+        """Aplica la tasa y la concurrencia de esta clase a la consulta del bloque."""
+        if RATE_LIMIT_ENABLED and self.rate > 0:
+            wait_ms = self._take_token(client)
+            if wait_ms:
+                self._reject(
+                    route, status.HTTP_429_TOO_MANY_REQUESTS, "tasa", wait_ms / 1000
+                )
+
+        if self.concurrency <= 0:
+            yield
+            return
+        semaphore = self._semaphore(route)
+        if not semaphore.acquire(timeout=ADMISSION_QUEUE_MS / 1000):
+            self._reject(route, status.HTTP_503_SERVICE_UNAVAILABLE, "concurrencia", 1)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    async def __call__(self, request: Request) -> None:
+        route = getattr(request.scope.get("route"), "path", request.url.path)
+        # Se hereda en el hilo que ejecuta la ruta síncrona
+        _current.set((self, route, client_id(request)))
+
+
+_current: ContextVar[Optional[Tuple[Admission, str, str]]] = ContextVar(
+    "admission", default=None
+)
+
+
+@contextmanager
+def admitted() -> Iterator[None]:
+    """Envuelve la consulta sin cache de una ruta con admisión (no hace nada fuera de ellas)."""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    admission, route, client = current
+    with admission.admit(route, client):
+        yield
+
+
+search_admission = Admission(
+    "busqueda",
+    concurrency=int(os.getenv("ADMISSION_SEARCH_CONCURRENCY", "4")),
+    rate=float(os.getenv("RATE_LIMIT_SEARCH_PER_SEC", "10")),
+    burst=int(os.getenv("RATE_LIMIT_SEARCH_BURST", "20")),
+)
+list_admission = Admission(
+    "listado",
+    concurrency=int(os.getenv("ADMISSION_LIST_CONCURRENCY", "4")),
+    rate=float(os.getenv("RATE_LIMIT_LIST_PER_SEC", "10")),
+    burst=int(os.getenv("RATE_LIMIT_LIST_BURST", "30")),
+)
@@ -1,20 +1,115 @@
 """Verificación de token"""
 
+import hashlib
 import json
+import logging
 import os
+import threading
+import time
 import urllib.request
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
 from fastapi import HTTPException, status, Header
-from firebase_admin import credentials, auth, initialize_app
+import firebase_admin
+from firebase_admin import credentials, auth, initialize_app, get_app
+from firebase_admin import _token_gen
 
-firebase_url = os.getenv("FIREBASE_CREDENTIALS_PATH")
+logger = logging.getLogger(__name__)
 
-if firebase_url:
-    with urllib.request.urlopen(firebase_url) as response:
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", str(60 * 5)))
+CERT_PREFETCH_INTERVAL = int(os.getenv("CERT_PREFETCH_INTERVAL", str(60 * 30)))
+
+# hash del token -> (expira_en, claims)
+_token_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_token_lock = threading.Lock()
+
+
+def _cert_fetcher() -> Optional[Callable[[], object]]:
+    """
+    Función que descarga las claves públicas de Google en el cliente HTTP con
+    cache que usa verify_id_token, o None si la API interna de firebase_admin
+    cambió (está fijado en requirements.txt; sin precarga, la primera
+    verificación descarga las claves como siempre).
+    """
+    # pylint: disable=protected-access
+    try:
+        request = auth._get_client(None)._token_verifier.request
+        cert_uri = _token_gen.ID_TOKEN_CERT_URI
+    except AttributeError as e:
+        logger.warning(
+            "⚠️ No se precargan los certificados de Firebase: firebase_admin %s (%s)",
+            firebase_admin.__version__,
+            e,
+        )
+        return None
+    return lambda: request(cert_uri)
+
+
+def _prefetch_loop() -> None:
+    """Mantiene caliente el cache HTTP de certificados fuera del hilo de la solicitud."""
+    fetch = _cert_fetcher()
+    if fetch is None:
+        return
+    while True:
+        try:
+            fetch()
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("No se pudieron precargar los certificados de Firebase")
+        time.sleep(CERT_PREFETCH_INTERVAL)
+
+
+def start_cert_prefetch() -> None:
+    """Inicia el hilo en segundo plano que precarga los certificados."""
+    threading.Thread(target=_prefetch_loop, name="firebase-certs", daemon=True).start()
+
+
+def init_firebase(timeout: float = 10) -> None:
+    """Descarga las credenciales de Firebase e inicializa la app (una sola vez)."""
+    try:
+        get_app()
+        return
+    except ValueError:
+        pass
+
+    firebase_url = os.getenv("FIREBASE_CREDENTIALS_PATH")
+    if not firebase_url:
+        logger.warning("⚠️ No Firebase credentials found.")
+        return
+
+    with urllib.request.urlopen(firebase_url, timeout=timeout) as response:
         cred_data = json.load(response)
     cred = credentials.Certificate(cred_data)
     initialize_app(cred)
-else:
-    print("⚠️ No Firebase credentials found.")
+    start_cert_prefetch()
+
+
+def verify_id_token_cached(token: str) -> dict:
+    """
+    Verifica un ID token usando un cache de tokens ya verificados.
+    La entrada se guarda por el hash del token y nunca sobrevive a su claim exp.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+
+    with _token_lock:
+        entry = _token_cache.get(key)
+        if entry and entry[0] > now:
+            _token_cache.move_to_end(key)
+            return entry[1]
+        if entry:
+            del _token_cache[key]
+
+    decoded_token = auth.verify_id_token(token)
+
+    expires_at = min(float(decoded_token.get("exp", 0)), now + TOKEN_CACHE_MAX_TTL)
+    if expires_at > now:
+        with _token_lock:
+            _token_cache[key] = (expires_at, decoded_token)
+            _token_cache.move_to_end(key)
+            while len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+    return decoded_token
 
 
 def verify_token(authorization: str = Header(...)):
@@ -27,7 +122,7 @@ def verify_token(authorization: str = Header(...)):
 
     try:
         token = authorization.replace("Bearer ", "").strip()
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = verify_id_token_cached(token)
         email = decoded_token.get("email")
         return email
 
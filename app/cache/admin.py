@@ -2,16 +2,53 @@
 
 import os
 import redis
-from redis.connection import SSLConnection
+from redis.connection import Connection, SSLConnection
 from dotenv import load_dotenv
 
 load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.25"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+# TLS por defecto (Redis administrado); REDIS_SSL=false para un Redis local
+REDIS_SSL = os.getenv("REDIS_SSL", "true").lower() == "true"
+CONNECTION_CLASS = SSLConnection if REDIS_SSL else Connection
+# Máximo de conexiones por pool y worker (0 = sin límite); al agotarse se espera
+# hasta REDIS_POOL_TIMEOUT por una libre en vez de abrir otra
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "0"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "0.5"))
 
-pool = redis.ConnectionPool.from_url(
-    REDIS_URL, connection_class=SSLConnection, decode_responses=True
+
+def _connection_pool(**kwargs) -> redis.ConnectionPool:
+    if REDIS_MAX_CONNECTIONS > 0:
+        return redis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            **kwargs,
+        )
+    return redis.ConnectionPool.from_url(REDIS_URL, **kwargs)
+
+
+pool = _connection_pool(
+    connection_class=CONNECTION_CLASS,
+    decode_responses=True,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
 )
 
 redis_connection = redis.Redis(connection_pool=pool)
-print(redis_connection.ping())
+
+# Cliente sin decode_responses para valores binarios (cuerpos comprimidos)
+binary_pool = _connection_pool(
+    connection_class=CONNECTION_CLASS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
+
+redis_binary = redis.Redis(connection_pool=binary_pool)
+
+
+def ping_redis() -> bool:
+    """Comprueba la conexión con Redis (se usa en el arranque, no al importar)."""
+    return redis_connection.ping()
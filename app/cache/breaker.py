@@ -0,0 +1,159 @@
+"""Circuit breaker para las llamadas a Redis.
+
+Estados:
+  - closed:    las llamadas pasan normalmente.
+  - open:      tras varios fallos o llamadas lentas seguidas, no se llama a Redis;
+               las lecturas devuelven None (se va a la base de datos) y las
+               escrituras se omiten.
+  - half_open: pasado el tiempo de espera se deja pasar una sola llamada de prueba;
+               si va bien se cierra, si falla se vuelve a abrir.
+
+Con ``on_recover`` se registran funciones que se llaman cuando Redis vuelve a
+responder después de fallos (p. ej. para repetir invalidaciones perdidas).
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+from redis.exceptions import RedisError
+from app.metrics import registry
+from app.timing import record
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Corta las llamadas a un servicio que falla o responde lento."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_seconds: float = 0.1,
+        reset_timeout: float = 10.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self.stats: Dict[str, int] = {
+            "trips": 0,
+            "fallbacks": 0,
+            "failures": 0,
+            "slow_calls": 0,
+        }
+
+    def on_recover(self, func: Callable[[], None]) -> None:
+        """Registra ``func`` para cuando una llamada vuelve a ir bien tras fallos."""
+        self._listeners.append(func)
+
+    def allow(self) -> bool:
+        """Indica si la llamada puede ir a Redis (en half_open, solo una de prueba)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if (
+                self.state == OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout
+            ):
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.stats["fallbacks"] += 1
+            return False
+
+    def record_success(self, elapsed: float) -> None:
+        """Registra una llamada correcta; si fue lenta cuenta como fallo."""
+        if elapsed > self.slow_call_seconds:
+            with self._lock:
+                self.stats["slow_calls"] += 1
+            self._record_problem()
+            return
+        with self._lock:
+            recovered = self._failures > 0 or self.state == HALF_OPEN
+            self._failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._probing = False
+                logger.info("Circuito %s cerrado: Redis respondió", self.name)
+        if recovered:
+            for func in self._listeners:
+                try:
+                    func()
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Error al avisar la recuperación de %s", self.name)
+
+    def _end_probe(self) -> None:
+        """Libera la llamada de prueba si terminó sin decidir el estado (error ajeno a Redis)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def record_failure(self) -> None:
+        """Registra una llamada fallida."""
+        with self._lock:
+            self.stats["failures"] += 1
+        self._record_problem()
+
+    def _record_problem(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.stats["trips"] += 1
+                logger.warning(
+                    "Circuito %s abierto: se usa la base de datos durante %.0f s",
+                    self.name,
+                    self.reset_timeout,
+                )
+
+    def call(self, func: Callable, *args, default: Any = None, **kwargs) -> Any:
+        """Ejecuta ``func`` protegida; devuelve ``default`` si el circuito está abierto o falla."""
+        if not self.allow():
+            return default
+
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except RedisError as e:
+            elapsed = time.perf_counter() - start
+            record(self.name, elapsed)
+            registry.observe(f"{self.name}_call_duration_seconds", elapsed, ok="false")
+            self.record_failure()
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            logger.warning("Redis no disponible (%s): %s", self.name, e)
+            return default
+        else:
+            elapsed = time.perf_counter() - start
+            record(self.name, elapsed)
+            registry.observe(f"{self.name}_call_duration_seconds", elapsed, ok="true")
+            self.record_success(elapsed)
+            return result
+        finally:
+            # Otra excepción (p. ej. un error de la función) no cierra ni abre el
+            # circuito: sin esto la prueba quedaría tomada y nunca se probaría de nuevo
+            self._end_probe()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado actual y contadores, para métricas."""
+        with self._lock:
+            return {"state": self.state, **self.stats}
@@ -1,17 +1,29 @@
 """Cache for categories"""
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from app.metrics import cache_result
 from app.schemas import CategoryOut
+from app.cache.admin import redis_connection
 from app.cache.cache_utils import (
+    redis_breaker,
+    guarded_write,
     make_key,
     make_search_key,
-    get_cache,
-    set_cache,
+    get_cache_raw,
+    decode_cached,
+    set_cache_raw,
+    get_many_cache_raw,
+    set_many_cache_raw,
     DEFAULT_TTL,
+    SEARCH,
     CATEGORIES,
     CATEGORY,
 )
 
+CATEGORY_LIST = TypeAdapter(List[CategoryOut])
+
 # -----------------------------
 # CATEGORÍAS COMPLETAS
 # -----------------------------
@@ -23,10 +35,7 @@ def get_categories_from_cache() -> Optional[List[CategoryOut]]:
     Devuelve None si no existe en caché.
     """
     key = make_key(CATEGORIES)
-    data = get_cache(key)
-    if not data:
-        return None
-    return [CategoryOut.model_validate(item) for item in data]
+    return decode_cached(CATEGORY, get_cache_raw(key), CATEGORY_LIST.validate_json)
 
 
 def set_categories_cache(categories: List[CategoryOut], ttl: int = DEFAULT_TTL) -> None:
@@ -34,8 +43,7 @@ def set_categories_cache(categories: List[CategoryOut], ttl: int = DEFAULT_TTL)
     Serializa y guarda la lista de categorías en Redis con un TTL.
     """
     key = make_key(CATEGORIES)
-    value = [cat.model_dump(mode="json") for cat in categories]
-    set_cache(key, value, ttl)
+    set_cache_raw(key, to_json(categories), ttl)
 
 
 # -----------------------------
@@ -48,8 +56,7 @@ def get_category_from_cache_by_id(category_id: int) -> Optional[CategoryOut]:
     Intenta obtener una categoría individual desde Redis.
     """
     key = make_key(CATEGORY, category_id)
-    data = get_cache(key)
-    return CategoryOut.model_validate(data) if data else None
+    return decode_cached(CATEGORY, get_cache_raw(key), CategoryOut.model_validate_json)
 
 
 def set_category_cache_by_id(category: CategoryOut, ttl: int = DEFAULT_TTL) -> None:
@@ -57,7 +64,27 @@ def set_category_cache_by_id(category: CategoryOut, ttl: int = DEFAULT_TTL) -> N
     Guarda una categoría individual en Redis.
     """
     key = make_key(CATEGORY, category.id)
-    set_cache(key, category.model_dump(mode="json"), ttl)
+    set_cache_raw(key, category.model_dump_json(), ttl)
+
+
+def get_categories_from_cache_by_ids(ids: List[int]) -> Dict[int, CategoryOut]:
+    """Obtiene varios CategoryOut por ID con un solo MGET; omite los que no estén."""
+    keys = [make_key(CATEGORY, item_id) for item_id in ids]
+    found = {}
+    for item_id, data in zip(ids, get_many_cache_raw(keys)):
+        item = decode_cached(CATEGORY, data, CategoryOut.model_validate_json)
+        if item is not None:
+            found[item_id] = item
+    return found
+
+
+def set_categories_cache_by_id(
+    items: List[CategoryOut], ttl: int = DEFAULT_TTL
+) -> None:
+    """Guarda varios CategoryOut individuales en un solo pipeline."""
+    set_many_cache_raw(
+        {make_key(CATEGORY, item.id): item.model_dump_json() for item in items}, ttl
+    )
 
 
 # -----------------------------
@@ -68,10 +95,7 @@ def set_category_cache_by_id(category: CategoryOut, ttl: int = DEFAULT_TTL) -> N
 def get_category_search_cache(search_term: str) -> Optional[List[CategoryOut]]:
     """Obtiene una categoria por termino buscado"""
     key = make_search_key(CATEGORIES, search_term)
-    data = get_cache(key)
-    if not data:
-        return None
-    return [CategoryOut.model_validate(item) for item in data]
+    return decode_cached(SEARCH, get_cache_raw(key), CATEGORY_LIST.validate_json)
 
 
 def set_category_search_cache(
@@ -79,5 +103,140 @@ def set_category_search_cache(
 ) -> None:
     """Envia dato de busqueda de cache"""
     key = make_search_key(CATEGORIES, search_term)
-    value = [cat.model_dump(mode="json") for cat in categories]
-    set_cache(key, value, ttl)
+    set_cache_raw(key, to_json(categories), ttl)
+
+
+# -----------------------------
+# RESUMEN POR CATEGORÍA
+# -----------------------------
+# Hash con dos campos por categoría: productos:<id> (productos activos) y
+# stock:<id> (stock total de esos productos). Se calcula con un GROUP BY en un
+# MISS y luego se ajusta con HINCRBY en cada alta/edición/baja de producto.
+#
+# Cada ajuste incrementa además una época, exista o no el hash. Un MISS lee la
+# época antes del GROUP BY y solo guarda su resultado si el hash sigue ausente y
+# la época no cambió: si un commit llegó entre medio, sus conteos ya son viejos
+# y se descartan en vez de quedar en caché hasta el TTL.
+
+SUMMARY_KEY = make_key(CATEGORIES, suffix="summary")
+SUMMARY_EPOCH_KEY = make_key(CATEGORIES, suffix="summary:epoch")
+
+# Solo ajusta si el hash existe: si expiró, el próximo MISS lo recalcula completo.
+# Se ejecuta en el momento aunque sea dentro de after_commit(): encolar un HINCRBY
+# dejaría que un MISS recalculado entretanto lo contara dos veces.
+_ADJUST_SUMMARY = redis_connection.register_script("""
+redis.call('INCR', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+""")
+
+# ARGV: época leída antes del GROUP BY, TTL y luego pares campo/valor.
+_STORE_SUMMARY = redis_connection.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+""")
+
+
+def get_category_summary_epoch() -> Optional[str]:
+    """Época actual del resumen ("" si aún no hay) o None si Redis no responde."""
+    return redis_breaker.call(lambda: redis_connection.get(SUMMARY_EPOCH_KEY) or "")
+
+
+def get_category_summary_cache() -> Optional[Dict[int, Tuple[int, int]]]:
+    """Devuelve {categoria_id: (productos_activos, stock_total)} o None si no está en caché."""
+    data = redis_breaker.call(redis_connection.hgetall, SUMMARY_KEY)
+    if not data:
+        cache_result(CATEGORY, "miss")
+        return None
+    cache_result(CATEGORY, "hit")
+    counts: Dict[int, Tuple[int, int]] = {}
+    for field, value in data.items():
+        kind, _, category_id = field.partition(":")
+        if not category_id:
+            continue
+        productos, stock = counts.get(int(category_id), (0, 0))
+        if kind == "productos":
+            productos = int(value)
+        else:
+            stock = int(value)
+        counts[int(category_id)] = (productos, stock)
+    return counts
+
+
+def set_category_summary_cache(
+    counts: Dict[int, Tuple[int, int]], epoch: Optional[str], ttl: int = DEFAULT_TTL
+) -> None:
+    """
+    Guarda los conteos calculados en la base de datos si el hash sigue ausente y
+    la época no cambió desde ``epoch`` (leída antes de la consulta).
+    """
+    if epoch is None:
+        return
+    args = [epoch, ttl, "_", 1]
+    for category_id, (productos, stock) in counts.items():
+        args += [f"productos:{category_id}", productos, f"stock:{category_id}", stock]
+    guarded_write(
+        [CATEGORIES], _STORE_SUMMARY, keys=[SUMMARY_KEY, SUMMARY_EPOCH_KEY], args=args
+    )
+
+
+def adjust_category_summary(deltas: Dict[int, Tuple[int, int]]) -> None:
+    """Suma {categoria_id: (productos, stock)} al resumen con un script atómico."""
+    args = []
+    for category_id, (productos, stock) in deltas.items():
+        if productos:
+            args += [f"productos:{category_id}", productos]
+        if stock:
+            args += [f"stock:{category_id}", stock]
+    if args:
+        guarded_write(
+            [CATEGORIES],
+            _ADJUST_SUMMARY,
+            keys=[SUMMARY_KEY, SUMMARY_EPOCH_KEY],
+            args=args,
+        )
+
+
+def drop_category_summary(category_id: int) -> None:
+    """Quita del resumen los contadores de una categoría eliminada."""
+    guarded_write(
+        [CATEGORIES],
+        redis_connection.hdel,
+        SUMMARY_KEY,
+        f"productos:{category_id}",
+        f"stock:{category_id}",
+    )
+
+
+def product_summary_deltas(
+    before: Optional[Tuple[Optional[int], bool, int]],
+    after: Optional[Tuple[Optional[int], bool, int]],
+) -> Dict[int, Tuple[int, int]]:
+    """
+    Diferencia en el resumen al pasar un producto de ``before`` a ``after``,
+    cada uno (categoria_id, activo, stock_total) o None si no existe.
+    """
+    deltas: Dict[int, Tuple[int, int]] = {}
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        category_id, activo, stock = state
+        if category_id is None or not activo:
+            continue
+        productos, total = deltas.get(category_id, (0, 0))
+        deltas[category_id] = (productos + sign, total + sign * (stock or 0))
+    return deltas
@@ -1,17 +1,26 @@
 """Cache for products"""
 
-from typing import List, Optional
+from typing import Dict, List, Optional
+from pydantic import TypeAdapter
+from pydantic_core import to_json
 from app.schemas import ProductOut
+from app.cache.compression import compress_all
 from app.cache.cache_utils import (
     make_key,
     make_search_key,
-    get_cache,
-    set_cache,
+    get_cache_raw,
+    decode_cached,
+    set_cache_raw,
+    get_many_cache_raw,
+    set_many_cache_raw,
     DEFAULT_TTL,
+    SEARCH,
     PRODUCTS,
     PRODUCT,
 )
 
+PRODUCT_LIST = TypeAdapter(List[ProductOut])
+
 # -----------------------------
 # PRODUCTOS COMPLETAS
 # -----------------------------
@@ -23,17 +32,14 @@ def get_products_from_cache() -> Optional[List[ProductOut]]:
     Devuelve None si no existe en caché.
     """
     key = make_key(PRODUCTS)
-    data = get_cache(key)
-    if not data:
-        return None
-    return [ProductOut.model_validate(item) for item in data]
+    return decode_cached(PRODUCT, get_cache_raw(key), PRODUCT_LIST.validate_json)
 
 
 def set_products_cache(products: List[ProductOut], ttl: int = DEFAULT_TTL) -> None:
-    """Serializa y guarda la lista de PRODUCTOS en Redis con un TTL."""
+    """Serializa y guarda la lista de PRODUCTOS en Redis con un TTL (y comprimida)."""
     key = make_key(PRODUCTS)
-    value = [cat.model_dump(mode="json") for cat in products]
-    set_cache(key, value, ttl)
+    payload = to_json(products)
+    set_cache_raw(key, payload, ttl, encoded=compress_all(payload))
 
 
 # -----------------------------
@@ -44,14 +50,31 @@ def set_products_cache(products: List[ProductOut], ttl: int = DEFAULT_TTL) -> No
 def get_product_from_cache_by_id(product_id: int) -> Optional[ProductOut]:
     """Intenta obtener un PRODUCTO individual desde Redis."""
     key = make_key(PRODUCT, product_id)
-    data = get_cache(key)
-    return ProductOut.model_validate(data) if data else None
+    return decode_cached(PRODUCT, get_cache_raw(key), ProductOut.model_validate_json)
 
 
 def set_product_cache_by_id(product: ProductOut, ttl: int = DEFAULT_TTL) -> None:
     """Guarda un PRODUCTO individual en Redis."""
     key = make_key(PRODUCT, product.id)
-    set_cache(key, product.model_dump(mode="json"), ttl)
+    set_cache_raw(key, product.model_dump_json(), ttl)
+
+
+def get_products_from_cache_by_ids(ids: List[int]) -> Dict[int, ProductOut]:
+    """Obtiene varios ProductOut por ID con un solo MGET; omite los que no estén."""
+    keys = [make_key(PRODUCT, item_id) for item_id in ids]
+    found = {}
+    for item_id, data in zip(ids, get_many_cache_raw(keys)):
+        item = decode_cached(PRODUCT, data, ProductOut.model_validate_json)
+        if item is not None:
+            found[item_id] = item
+    return found
+
+
+def set_products_cache_by_id(items: List[ProductOut], ttl: int = DEFAULT_TTL) -> None:
+    """Guarda varios ProductOut individuales en un solo pipeline."""
+    set_many_cache_raw(
+        {make_key(PRODUCT, item.id): item.model_dump_json() for item in items}, ttl
+    )
 
 
 # -----------------------------
@@ -62,10 +85,7 @@ def set_product_cache_by_id(product: ProductOut, ttl: int = DEFAULT_TTL) -> None
 def get_product_search_cache(search_term: str) -> Optional[List[ProductOut]]:
     """Obtiene una categoria por termino buscado"""
     key = make_search_key(PRODUCTS, search_term)
-    data = get_cache(key)
-    if not data:
-        return None
-    return [ProductOut.model_validate(item) for item in data]
+    return decode_cached(SEARCH, get_cache_raw(key), PRODUCT_LIST.validate_json)
 
 
 def set_product_search_cache(
@@ -73,7 +93,4 @@ def set_product_search_cache(
 ) -> None:
     """Envia dato de busqueda de cache"""
     key = make_search_key(PRODUCTS, search_term)
-    value = [cat.model_dump(mode="json") for cat in categories]
-
-    if value:
-        set_cache(key, value, ttl)
+    set_cache_raw(key, to_json(categories), ttl)
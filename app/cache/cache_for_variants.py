@@ -1,17 +1,27 @@
 """Cache for Variants"""
 
-from typing import List, Optional
+from typing import Dict, List, Optional
+from pydantic import TypeAdapter
+from pydantic_core import to_json
 from app.schemas import VarianteOut
+from app.cache.compression import compress_all
 from app.cache.cache_utils import (
     make_key,
     make_search_key,
-    get_cache,
-    set_cache,
+    get_cache_raw,
+    decode_cached,
+    set_cache_raw,
+    get_many_cache_raw,
+    set_many_cache_raw,
     DEFAULT_TTL,
+    SEARCH,
     VARIANT,
     VARIANTS,
+    VARIANT_SKU,
 )
 
+VARIANT_LIST = TypeAdapter(List[VarianteOut])
+
 # -----------------------------
 # VARIANTE COMPLETAS
 # -----------------------------
@@ -23,19 +33,16 @@ def get_variants_from_cache() -> Optional[List[VarianteOut]]:
     Devuelve None si no existe en caché.
     """
     key = make_key(VARIANTS)
-    data = get_cache(key)
-    if not data:
-        return None
-    return [VarianteOut.model_validate(item) for item in data]
+    return decode_cached(VARIANT, get_cache_raw(key), VARIANT_LIST.validate_json)
 
 
 def set_variants_cache(variants: List[VarianteOut], ttl: int = DEFAULT_TTL) -> None:
     """
-    Serializa y guarda la lista de variantes en Redis con un TTL.
+    Serializa y guarda la lista de variantes en Redis con un TTL (y comprimida).
     """
     key = make_key(VARIANTS)
-    value = [variant.model_dump(mode="json") for variant in variants]
-    set_cache(key, value, ttl)
+    payload = to_json(variants)
+    set_cache_raw(key, payload, ttl, encoded=compress_all(payload))
 
 
 # -----------------------------
@@ -48,8 +55,7 @@ def get_variant_from_cache_by_id(variant_id: int) -> Optional[VarianteOut]:
     Intenta obtener una variante individual desde Redis.
     """
     key = make_key(VARIANT, variant_id)
-    data = get_cache(key)
-    return VarianteOut.model_validate(data) if data else None
+    return decode_cached(VARIANT, get_cache_raw(key), VarianteOut.model_validate_json)
 
 
 def set_variant_cache_by_id(variant: VarianteOut, ttl: int = DEFAULT_TTL) -> None:
@@ -57,7 +63,54 @@ def set_variant_cache_by_id(variant: VarianteOut, ttl: int = DEFAULT_TTL) -> Non
     Guarda una variante individual en Redis.
     """
     key = make_key(VARIANT, variant.id)
-    set_cache(key, variant.model_dump(mode="json"), ttl)
+    set_cache_raw(key, variant.model_dump_json(), ttl)
+
+
+def get_variants_from_cache_by_ids(ids: List[int]) -> Dict[int, VarianteOut]:
+    """Obtiene varios VarianteOut por ID con un solo MGET; omite los que no estén."""
+    keys = [make_key(VARIANT, item_id) for item_id in ids]
+    found = {}
+    for item_id, data in zip(ids, get_many_cache_raw(keys)):
+        item = decode_cached(VARIANT, data, VarianteOut.model_validate_json)
+        if item is not None:
+            found[item_id] = item
+    return found
+
+
+def set_variants_cache_by_id(items: List[VarianteOut], ttl: int = DEFAULT_TTL) -> None:
+    """Guarda varios VarianteOut individuales en un solo pipeline."""
+    set_many_cache_raw(
+        {make_key(VARIANT, item.id): item.model_dump_json() for item in items}, ttl
+    )
+
+
+# -----------------------------
+# VARIANTE POR SKU EXACTO
+# -----------------------------
+
+
+def get_variants_from_cache_by_skus(skus: List[str]) -> Dict[str, VarianteOut]:
+    """Obtiene varias variantes por SKU exacto con un solo MGET; omite las que no estén."""
+    keys = [make_key(VARIANT_SKU, sku) for sku in skus]
+    found = {}
+    for sku, data in zip(skus, get_many_cache_raw(keys)):
+        item = decode_cached(VARIANT, data, VarianteOut.model_validate_json)
+        if item is not None:
+            found[sku] = item
+    return found
+
+
+def set_variants_cache_by_sku(
+    variants: List[VarianteOut], ttl: int = DEFAULT_TTL
+) -> None:
+    """Guarda varias variantes bajo su clave de SKU en un solo pipeline."""
+    set_many_cache_raw(
+        {
+            make_key(VARIANT_SKU, variant.sku): variant.model_dump_json()
+            for variant in variants
+        },
+        ttl,
+    )
 
 
 # -----------------------------
@@ -68,10 +121,7 @@ def set_variant_cache_by_id(variant: VarianteOut, ttl: int = DEFAULT_TTL) -> Non
 def get_variant_search_cache(search_term: str) -> Optional[List[VarianteOut]]:
     """Obtiene una variante por termino buscado"""
     key = make_search_key(VARIANTS, search_term)
-    data = get_cache(key)
-    if not data:
-        return None
-    return [VarianteOut.model_validate(item) for item in data]
+    return decode_cached(SEARCH, get_cache_raw(key), VARIANT_LIST.validate_json)
 
 
 def set_variant_search_cache(
@@ -79,5 +129,4 @@ def set_variant_search_cache(
 ) -> None:
     """Envia dato de busqueda de cache"""
     key = make_search_key(VARIANTS, search_term)
-    value = [variant.model_dump(mode="json") for variant in variants]
-    set_cache(key, value, ttl)
+    set_cache_raw(key, to_json(variants), ttl)
@@ -1,12 +1,44 @@
 """Archivo para centralizar la invalidación caché"""
 
+import hashlib
+import logging
 import os
 import json
-from typing import Any, Optional
-from app.cache.admin import redis_connection
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from pydantic import ValidationError
+from app.cache.admin import redis_binary, redis_connection
+from app.cache.breaker import CircuitBreaker
+from app.cache.compression import ENCODINGS
+from app.cache.maintenance import cache_maintenance
+from app.metrics import cache_result, registry
+from app.timing import timed
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 DEFAULT_TTL = int(os.getenv("TTL_DETAIL", str(60 * 10)))
 
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=int(os.getenv("REDIS_BREAKER_FAILURES", "5")),
+    slow_call_seconds=float(os.getenv("REDIS_SLOW_CALL_MS", "100")) / 1000,
+    reset_timeout=float(os.getenv("REDIS_BREAKER_RESET", "10")),
+)
+
 CATEGORIES = "categories"
 CATEGORY = "category"
 
@@ -15,6 +47,10 @@ PRODUCT = "product"
 
 VARIANTS = "variants"
 VARIANT = "variant"
+VARIANT_SKU = "variant:sku"
+
+# Espacio de métricas para todas las búsquedas cacheadas
+SEARCH = "search"
 
 # -----------------------------
 # GENERACIÓN DE CLAVES
@@ -39,20 +75,190 @@ def make_search_key(resource: str, search_term: str) -> str:
     return f"{resource}:search:{search_term.lower()}"
 
 
+def make_etag_key(key: str) -> str:
+    """Clave donde se guarda el ETag del JSON guardado en ``key``."""
+    return f"{key}:etag"
+
+
+def make_etag(payload: Union[bytes, str]) -> str:
+    """ETag fuerte (hash del contenido) de un JSON ya serializado."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+
 # -----------------------------
 # OPERACIONES GENÉRICAS DE CACHÉ
 # -----------------------------
+# Todas las llamadas pasan por redis_breaker: si Redis falla o está lento,
+# las lecturas devuelven None (se consulta la base de datos) y las escrituras
+# se omiten (y su espacio se vacía al recuperarse, ver guarded_write).
+
+
+# Espacios (prefijo de la clave) con escrituras o invalidaciones que no llegaron
+# a Redis por el circuito abierto o un error: lo que quedó guardado puede ser de
+# una versión anterior, así que se vacían enteros cuando Redis se recupera
+_dropped_namespaces: Set[str] = set()
+_dropped_lock = threading.Lock()
+_DROPPED = object()
+
+
+def key_namespace(key: str) -> str:
+    """Espacio de una clave: ``product:5`` -> ``product``."""
+    return key.split(":", 1)[0]
+
+
+def guarded_write(namespaces: Iterable[str], func: Callable, *args, **kwargs) -> Any:
+    """
+    Ejecuta una escritura o invalidación protegida por redis_breaker. Si no llega
+    a Redis, recuerda los espacios afectados para vaciarlos al recuperarse y
+    devuelve None.
+    """
+    result = redis_breaker.call(func, *args, default=_DROPPED, **kwargs)
+    if result is _DROPPED:
+        with _dropped_lock:
+            _dropped_namespaces.update(namespaces)
+        return None
+    return result
+
+
+def flush_dropped_namespaces() -> None:
+    """Vacía los espacios con escrituras perdidas mientras Redis fallaba."""
+    with _dropped_lock:
+        namespaces = sorted(_dropped_namespaces)
+        _dropped_namespaces.clear()
+    for namespace in namespaces:
+        logger.warning("🧹 Cache › se vacía %s: hubo escrituras sin aplicar", namespace)
+        invalidate_pattern(namespace)
+
+
+def _on_redis_recovered() -> None:
+    with _dropped_lock:
+        if not _dropped_namespaces:
+            return
+    # Fuera del hilo de la solicitud cuya llamada detectó la recuperación
+    threading.Thread(
+        target=flush_dropped_namespaces, name="cache-recovery", daemon=True
+    ).start()
+
+
+redis_breaker.on_recover(_on_redis_recovered)
 
 
 def get_cache(key: str) -> Optional[Any]:
     """Obtiene cualquier valor desde Redis usando la clave dada."""
-    data = redis_connection.get(key)
+    data = redis_breaker.call(redis_connection.get, key)
     return json.loads(data) if data else None
 
 
 def set_cache(key: str, value: Any, ttl: int = DEFAULT_TTL) -> None:
     """Guarda cualquier valor en Redis serializado como JSON."""
-    redis_connection.set(key, json.dumps(value), ex=ttl)
+    guarded_write(
+        [key_namespace(key)], redis_connection.set, key, json.dumps(value), ex=ttl
+    )
+
+
+def get_cache_raw(key: str) -> Optional[str]:
+    """Obtiene el JSON guardado en Redis sin deserializarlo."""
+    return redis_breaker.call(redis_connection.get, key)
+
+
+def decode_cached(
+    namespace: str, data: Optional[Union[bytes, str]], parse: Callable[[Any], T]
+) -> Optional[T]:
+    """
+    Convierte un payload del cache con ``parse`` y lo cuenta en las métricas
+    de ``namespace``: miss si no hay dato, stale si ya no valida contra el
+    esquema actual (se trata como miss) y hit en otro caso.
+    """
+    if not data:
+        cache_result(namespace, "miss")
+        return None
+    try:
+        with timed("validacion"):
+            value = parse(data)
+    except ValidationError:
+        cache_result(namespace, "stale")
+        return None
+    cache_result(namespace, "hit")
+    return value
+
+
+def make_encoded_key(key: str, encoding: str) -> str:
+    """Clave del cuerpo de ``key`` comprimido con ``encoding`` (gzip, br)."""
+    return f"{key}:{encoding}"
+
+
+def set_cache_raw(
+    key: str,
+    payload: Union[bytes, str],
+    ttl: int = DEFAULT_TTL,
+    encoded: Optional[Dict[str, bytes]] = None,
+) -> None:
+    """
+    Guarda un JSON ya serializado en Redis junto con su ETag y, si se pasan, sus
+    versiones comprimidas (``encoded``: gzip, br). Todo va en una transacción y en
+    una sola entrada de la cola de mantenimiento: nunca queda un cuerpo
+    comprimido de una versión con el ETag de otra.
+    """
+
+    def _write():
+        # El cliente binario acepta el JSON (str o bytes) y los cuerpos comprimidos
+        pipe = (redis_binary if encoded else redis_connection).pipeline()
+        pipe.set(key, payload, ex=ttl)
+        pipe.set(make_etag_key(key), make_etag(payload), ex=ttl)
+        for encoding, body in (encoded or {}).items():
+            pipe.set(make_encoded_key(key, encoding), body, ex=ttl)
+        pipe.execute()
+
+    cache_maintenance.submit(key, guarded_write, [key_namespace(key)], _write)
+
+
+def get_encoded_cache(key: str, encoding: str) -> Optional[Tuple[bytes, str]]:
+    """Obtiene (cuerpo comprimido, ETag de la entrada) con un MGET; None si falta alguno."""
+    body, etag = redis_breaker.call(
+        redis_binary.mget,
+        [make_encoded_key(key, encoding), make_etag_key(key)],
+        default=[None, None],
+    )
+    if body is None or etag is None:
+        return None
+    return body, etag.decode()
+
+
+def get_etag(key: str) -> Optional[str]:
+    """Obtiene solo el ETag de una entrada, sin traer el JSON."""
+    return redis_breaker.call(redis_connection.get, make_etag_key(key))
+
+
+def get_many_cache_raw(keys: List[str]) -> List[Optional[str]]:
+    """Obtiene varios JSON con un solo MGET (None en las claves que falten)."""
+    if not keys:
+        return []
+    return redis_breaker.call(redis_connection.mget, keys, default=[None] * len(keys))
+
+
+def set_many_cache_raw(
+    payloads: Dict[str, Union[bytes, str]], ttl: int = DEFAULT_TTL
+) -> None:
+    """Guarda varios JSON ya serializados (con sus ETag) en un solo pipeline."""
+    if not payloads:
+        return
+
+    def _write():
+        pipe = redis_connection.pipeline(transaction=False)
+        for key, payload in payloads.items():
+            pipe.set(key, payload, ex=ttl)
+            pipe.set(make_etag_key(key), make_etag(payload), ex=ttl)
+        pipe.execute()
+
+    keys = tuple(payloads)
+    cache_maintenance.submit(
+        keys[0] if len(keys) == 1 else keys,
+        guarded_write,
+        {key_namespace(key) for key in keys},
+        _write,
+    )
 
 
 # -----------------------------
@@ -63,14 +269,65 @@ def set_cache(key: str, value: Any, ttl: int = DEFAULT_TTL) -> None:
 def invalidate_cache(
     resource: str, resource_id: Optional[Any] = None, suffix: str = "all"
 ) -> None:
-    """Elimina una clave específica del recurso."""
+    """Elimina una clave específica del recurso (y su ETag)."""
     key = make_key(resource, resource_id, suffix)
-    redis_connection.delete(key)
+    cache_maintenance.submit(
+        key,
+        guarded_write,
+        [resource],
+        redis_connection.delete,
+        key,
+        make_etag_key(key),
+        *(make_encoded_key(key, encoding) for encoding in ENCODINGS),
+    )
+
+
+def invalidate_keys(keys: List[str], chunk_size: int = 500) -> None:
+    """Elimina claves concretas (y sus ETag) en bloques de DEL, sin recorrer el keyspace."""
 
+    def _delete():
+        all_keys = keys + [make_etag_key(key) for key in keys]
+        for start in range(0, len(all_keys), chunk_size):
+            chunk = all_keys[start : start + chunk_size]
+            guarded_write(
+                {key_namespace(key) for key in chunk}, redis_connection.delete, *chunk
+            )
 
-def invalidate_pattern(resource: str, pattern_suffix: str = "*") -> None:
-    """Elimina todas las claves que coincidan con el patrón (usa wildcard)."""
+    cache_maintenance.submit(None, _delete)
+
+
+def invalidate_pattern(
+    resource: str, pattern_suffix: str = "*", scan_count: int = 500
+) -> None:
+    """
+    Elimina todas las claves que coincidan con el patrón (usa wildcard).
+    Recorre el keyspace con SCAN por páginas (no KEYS, que bloquea Redis).
+    """
     pattern = f"{resource}:{pattern_suffix}"
-    keys = redis_connection.keys(pattern)
-    if keys:
-        redis_connection.delete(*keys)
+    namespaces = [key_namespace(resource)]
+
+    def _scan_delete():
+        start = time.perf_counter()
+        cursor = 0
+        while True:
+            page = guarded_write(
+                namespaces,
+                redis_connection.scan,
+                cursor,
+                match=pattern,
+                count=scan_count,
+            )
+            if page is None:
+                break
+            cursor, keys = page
+            if keys:
+                guarded_write(namespaces, redis_connection.delete, *keys)
+            if not cursor:
+                break
+        registry.observe(
+            "cache_invalidate_pattern_duration_seconds",
+            time.perf_counter() - start,
+            resource=resource,
+        )
+
+    cache_maintenance.submit(("pattern", pattern), _scan_delete)
@@ -0,0 +1,59 @@
+"""Codificaciones precalculadas (gzip y brotli) de los listados grandes.
+
+Los cuerpos se comprimen una sola vez al guardarlos en el cache y se sirven tal
+cual según el Accept-Encoding del cliente, sin recomprimir en cada solicitud.
+brotli está en requirements.txt; sin él (p. ej. un entorno local incompleto) solo
+se genera gzip.
+"""
+
+import gzip
+import os
+from typing import Dict, Optional, Union
+
+try:
+    import brotli
+except ImportError:  # entorno sin requirements.txt completo: solo gzip
+    brotli = None
+
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Orden de preferencia cuando el cliente acepta varias con la misma calidad
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress_all(payload: Union[bytes, str]) -> Dict[str, bytes]:
+    """Devuelve {codificación: cuerpo comprimido}; vacío si el cuerpo es pequeño."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    if len(payload) < COMPRESSION_MIN_BYTES:
+        return {}
+    encoded = {"gzip": gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(payload, quality=BROTLI_QUALITY)
+    return encoded
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Elige la mejor codificación disponible aceptada por el cliente (respeta q=0)."""
+    if not accept_encoding:
+        return None
+    quality: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        quality[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = quality.get(encoding, quality.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,117 @@
+"""Eventos de cambios del catálogo publicados por Redis pub/sub.
+
+Las rutas de escritura (crud_products, crud_variants) publican un evento después
+del commit. Cada worker tiene un único hilo suscrito al canal que reparte los
+mensajes a las colas de sus clientes SSE conectados y, como los cambios pueden
+venir de otro host, pide reconstruir el snapshot local del catálogo.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Set
+from redis.exceptions import RedisError
+from app.cache.admin import redis_connection
+from app.cache.cache_utils import redis_breaker
+from app.cache.maintenance import cache_maintenance
+from app.cache.snapshot import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "catalog:events")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+PRODUCT_CREATED = "producto.creado"
+PRODUCT_UPDATED = "producto.actualizado"
+PRODUCT_DELETED = "producto.eliminado"
+VARIANT_CREATED = "variante.creada"
+VARIANT_UPDATED = "variante.actualizada"
+VARIANT_DELETED = "variante.eliminada"
+
+
+def publish_event(tipo: str, **data) -> None:
+    """Publica un evento de cambio (se omite si Redis no está disponible)."""
+    message = json.dumps({"tipo": tipo, **data})
+    # Después de las invalidaciones encoladas antes: el cliente que recarga ve el cambio
+    cache_maintenance.submit(
+        None, redis_breaker.call, redis_connection.publish, EVENTS_CHANNEL, message
+    )
+
+
+class EventHub:
+    """Reparte los mensajes del canal de Redis a los clientes conectados a este worker."""
+
+    def __init__(self):
+        self._queues: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Inicia el hilo suscriptor (una vez por worker)."""
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listen, name="catalog-events", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el hilo suscriptor."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _listen(self) -> None:
+        reconnecting = False
+        while not self._stop.is_set():
+            pubsub = redis_connection.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(EVENTS_CHANNEL)
+                if reconnecting:
+                    # Pudo perderse algún evento mientras no hubo suscripción
+                    catalog_snapshot.request_rebuild()
+                    reconnecting = False
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        # Cambios hechos en cualquier host: el snapshot local queda viejo
+                        catalog_snapshot.request_rebuild()
+                        self._loop.call_soon_threadsafe(
+                            self._broadcast, message["data"]
+                        )
+            except (RedisError, OSError) as e:
+                logger.warning("Suscripción a eventos interrumpida: %s", e)
+                reconnecting = True
+                time.sleep(1)
+            finally:
+                pubsub.close()
+
+    def _broadcast(self, data: str) -> None:
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Cliente lento: se descarta el evento más antiguo.
+                queue.get_nowait()
+                queue.put_nowait(data)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """Registra una cola para un cliente mientras dure la conexión."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self._queues.add(queue)
+        try:
+            yield queue
+        finally:
+            self._queues.discard(queue)
+
+
+event_hub = EventHub()
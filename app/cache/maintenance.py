@@ -0,0 +1,177 @@
+"""Mantenimiento del cache después del commit, fuera del camino de la respuesta.
+
+Las mutaciones envuelven su trabajo posterior al commit en ``after_commit()``:
+dentro de ese bloque las invalidaciones, escrituras del cache y eventos se
+encolan en lugar de ejecutarse, y la respuesta solo espera el commit de la
+base de datos. Un hilo por worker los ejecuta en orden. Los ajustes del
+resumen por categoría (HINCRBY, no idempotentes) siguen en el momento.
+
+  - Cola acotada (CACHE_MAINTENANCE_QUEUE): si se llena, quien encola espera
+    a que haya lugar en vez de descartar operaciones.
+  - Deduplicación por clave: tras recibir la primera operación el hilo espera
+    CACHE_MAINTENANCE_DELAY_MS; si en esa ventana llega otra operación sobre
+    la misma clave del cache, reemplaza a la pendiente (gana la última, en la
+    posición de la primera). Las operaciones sin clave (eventos, borrados de
+    listas de claves) nunca se combinan.
+  - Al apagar, ``stop()`` ejecuta lo pendiente antes de salir.
+
+Fuera de ``after_commit()`` (lecturas, CLI) o con CACHE_MAINTENANCE=false
+todo se ejecuta en el momento, como antes.
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Hashable, Iterator, Optional
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAINTENANCE = os.getenv("CACHE_MAINTENANCE", "true").lower() == "true"
+CACHE_MAINTENANCE_QUEUE = int(os.getenv("CACHE_MAINTENANCE_QUEUE", "10000"))
+CACHE_MAINTENANCE_DELAY_MS = float(os.getenv("CACHE_MAINTENANCE_DELAY_MS", "20"))
+
+_deferring: ContextVar[bool] = ContextVar("cache_after_commit", default=False)
+
+
+@contextmanager
+def after_commit() -> Iterator[None]:
+    """Encola (en vez de ejecutar) el mantenimiento del cache hecho dentro del bloque."""
+    token = _deferring.set(True)
+    try:
+        yield
+    finally:
+        _deferring.reset(token)
+
+
+class CacheMaintenance:
+    """Cola acotada y deduplicada de operaciones sobre el cache, con un hilo que la vacía."""
+
+    def __init__(self, enabled: bool, maxsize: int, delay: float):
+        self.enabled = enabled
+        self.maxsize = maxsize
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._running = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._unique = itertools.count()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        # El hilo no sobrevive al fork: el hijo arranca el suyo al primer submit
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._running = False
+        self._stopping = False
+        self._thread = None
+
+    def start(self) -> None:
+        """Vuelve a aceptar operaciones en la cola (al arrancar el worker)."""
+        with self._cond:
+            self._stopping = False
+
+    def submit(
+        self, key: Optional[Hashable], func: Callable, *args: Any, **kwargs: Any
+    ) -> None:
+        """
+        Ejecuta ``func`` ahora, o la encola si se llama dentro de ``after_commit()``.
+        ``key`` identifica la entrada del cache afectada (None = no combinar).
+        """
+        if not self.enabled or not _deferring.get():
+            func(*args, **kwargs)
+            return
+
+        with self._cond:
+            if self._stopping:
+                inline = True
+            else:
+                inline = False
+                if key is None:
+                    key = ("_", next(self._unique))
+                if key in self._pending:
+                    self._pending[key] = (func, args, kwargs)
+                    registry.inc("cache_maintenance_total", resultado="deduplicada")
+                    return
+                while len(self._pending) >= self.maxsize and not self._stopping:
+                    registry.inc("cache_maintenance_total", resultado="cola_llena")
+                    self._cond.wait()
+                self._pending[key] = (func, args, kwargs)
+                registry.inc("cache_maintenance_total", resultado="encolada")
+                self._ensure_thread()
+                self._cond.notify_all()
+        if inline:
+            func(*args, **kwargs)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="cache-maintenance", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                stopping = self._stopping
+            if not stopping:
+                time.sleep(self.delay)  # ventana de deduplicación
+            with self._cond:
+                batch = list(self._pending.values())
+                self._pending.clear()
+                self._running = True
+                self._cond.notify_all()
+            for func, args, kwargs in batch:
+                try:
+                    func(*args, **kwargs)
+                except Exception:  # pylint: disable=broad-except
+                    registry.inc("cache_maintenance_total", resultado="error")
+                    logger.exception("Falló el mantenimiento del cache (%s)", func)
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        """Operaciones encoladas que aún no se ejecutaron."""
+        return len(self._pending)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que se ejecute todo lo encolado; False si vence ``timeout``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ejecuta lo pendiente y detiene el hilo (al apagar el worker)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        if self._pending:
+            logger.warning(
+                "Mantenimiento del cache: %s operaciones sin ejecutar al apagar",
+                len(self._pending),
+            )
+
+
+cache_maintenance = CacheMaintenance(
+    CACHE_MAINTENANCE, CACHE_MAINTENANCE_QUEUE, CACHE_MAINTENANCE_DELAY_MS / 1000
+)
+registry.gauge("cache_maintenance_pending", lambda: {"": cache_maintenance.pending()})
@@ -0,0 +1,387 @@
+"""Snapshot local del catálogo: archivos versionados servidos con mmap.
+
+El listado completo de productos y categorías cambia pocas veces por hora pero
+se lee miles de veces por minuto. Cada vez que cambia, un hilo en segundo plano
+lo serializa a ``<recurso>-<etag>.json`` dentro de CATALOG_SNAPSHOT_DIR y
+publica la versión reemplazando atómicamente el puntero ``<recurso>.current``.
+Junto al JSON se escriben sus versiones comprimidas (``.json.gzip``, ``.json.br``).
+Cada worker mapea en memoria la versión apuntada y la cambia cuando el puntero
+cambia, así que los workers del mismo host comparten las páginas del archivo.
+
+El puntero guarda, además de la versión, cuándo empezó la construcción que la
+produjo y una huella barata del catálogo (conteos, último ``updated_at`` y las
+categorías). Las escrituras de este host y los eventos de ``catalog:events``
+(escrituras de otros hosts) marcan el snapshot como viejo con la hora del
+pedido; solo una versión cuya construcción empezó después de esa hora se
+considera al día, así que una construcción que leyó la base antes del cambio
+nunca lo tapa.
+
+Un solo worker por host construye a la vez (``flock`` sobre ``.build.lock``);
+los demás, al obtener el lock, ven la versión nueva y no repiten el trabajo.
+Como red de seguridad para cambios que no publican eventos (categorías,
+importaciones con app.cli en otro host), pasados CATALOG_SNAPSHOT_MAX_AGE
+segundos se compara la huella con la base: si no cambió solo se renueva el
+puntero, sin volver a leer el catálogo completo.
+
+Se activa definiendo CATALOG_SNAPSHOT_DIR; sin esa variable no hace nada.
+"""
+
+import glob
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+from pydantic_core import to_json
+from sqlalchemy import func, select
+from app.cache.cache_utils import CATEGORIES, PRODUCTS
+from app.cache.compression import compress_all
+from app.database import SessionLocal
+from app.functions.core_reads import fetch_categories, fetch_products
+from app.models import Producto, VarianteProducto
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", "")
+SNAPSHOT_DEBOUNCE = float(os.getenv("CATALOG_SNAPSHOT_DEBOUNCE_MS", "200")) / 1000
+SNAPSHOT_KEEP = int(os.getenv("CATALOG_SNAPSHOT_KEEP", "3"))
+SNAPSHOT_MAX_AGE = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "600"))
+# Espera antes de reintentar una reconstrucción fallida
+SNAPSHOT_RETRY = 5.0
+
+RESOURCES = (PRODUCTS, CATEGORIES)
+
+
+class SnapshotFile(NamedTuple):
+    """Versión mapeada en memoria de un recurso."""
+
+    version: str
+    body: mmap.mmap
+    etag: str
+    encoded: Dict[str, mmap.mmap]
+    built_at: int
+    fingerprint: str
+
+
+class Pointer(NamedTuple):
+    """Contenido de ``<recurso>.current``."""
+
+    version: str
+    # time.time_ns() al empezar la construcción (antes de leer la base)
+    built_at: int
+    fingerprint: str
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Escribe un archivo temporal en el mismo directorio y lo renombra encima de ``path``."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def catalog_fingerprint(db) -> str:
+    """
+    Huella barata del catálogo: conteo y último updated_at de productos y variantes
+    (los borrados cambian el conteo) y las categorías completas (tabla chica y sin
+    updated_at). Si no cambia, el snapshot publicado sigue al día.
+    """
+    parts = [
+        list(db.execute(select(func.count(), func.max(model.updated_at))).one())
+        for model in (Producto, VarianteProducto)
+    ]
+    payload = to_json([parts, fetch_categories(db)])
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _map(path: str) -> mmap.mmap:
+    """Mapea un archivo completo en memoria, solo lectura."""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class CatalogSnapshot:
+    """Construye, publica y lee los snapshots del catálogo de un directorio."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # recurso -> (mtime del puntero, archivo mapeado)
+        self._mapped: Dict[str, Tuple[int, SnapshotFile]] = {}
+        # recurso -> time.time_ns() del último pedido de reconstrucción sin atender
+        self._stale: Dict[str, int] = {}
+        # Hubo pedidos por cambios (no solo por antigüedad) desde la última pasada
+        self._changed = False
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """True si hay un directorio de snapshots configurado."""
+        return bool(self.directory)
+
+    def _pointer_path(self, resource: str) -> str:
+        return os.path.join(self.directory, f"{resource}.current")
+
+    def _data_path(self, resource: str, version: str) -> str:
+        return os.path.join(self.directory, f"{resource}-{version}.json")
+
+    def _pointer_mtime(self, resource: str) -> Optional[int]:
+        try:
+            return os.stat(self._pointer_path(resource)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_pointer(self, resource: str) -> Optional[Pointer]:
+        """Versión, hora de construcción y huella; None si no hay puntero."""
+        try:
+            with open(self._pointer_path(resource), "rb") as f:
+                lines = f.read().decode().split("\n")
+        except FileNotFoundError:
+            return None
+        # Punteros anteriores a este formato: solo la versión
+        lines += ["0", ""][len(lines) - 1 :]
+        return Pointer(lines[0].strip(), int(lines[1] or 0), lines[2].strip())
+
+    def _write_pointer(self, resource: str, pointer: Pointer) -> None:
+        data = f"{pointer.version}\n{pointer.built_at}\n{pointer.fingerprint}"
+        _write_atomic(self._pointer_path(resource), data.encode())
+
+    @contextmanager
+    def _build_lock(self) -> Iterator[None]:
+        """Un solo proceso del host construye a la vez."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".build.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # -----------------------------
+    # PUBLICACIÓN
+    # -----------------------------
+
+    def publish(
+        self, resource: str, payload: bytes, built_at: int = 0, fingerprint: str = ""
+    ) -> str:
+        """Guarda ``payload`` como nueva versión del recurso y mueve el puntero a ella."""
+        version = hashlib.sha256(payload).hexdigest()[:32]
+        path = self._data_path(resource, version)
+        if not os.path.exists(path):
+            for encoding, body in compress_all(payload).items():
+                _write_atomic(f"{path}.{encoding}", body)
+            _write_atomic(path, payload)
+        self._write_pointer(
+            resource, Pointer(version, built_at or time.time_ns(), fingerprint)
+        )
+        self._cleanup(resource, version)
+        return version
+
+    def _cleanup(self, resource: str, current: str) -> None:
+        """Borra versiones viejas; los workers que aún las tengan mapeadas no se ven afectados."""
+        paths = sorted(
+            glob.glob(os.path.join(self.directory, f"{resource}-*.json")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        current_path = self._data_path(resource, current)
+        old = [path for path in paths if path != current_path][SNAPSHOT_KEEP - 1 :]
+        for path in old:
+            for name in [path] + glob.glob(f"{path}.*"):
+                try:
+                    os.unlink(name)
+                except FileNotFoundError:
+                    pass
+
+    def build(self, db) -> None:
+        """Serializa el catálogo completo desde la base de datos y publica una versión."""
+        start = time.perf_counter()
+        # Antes de leer: la versión refleja todo lo confirmado hasta este momento
+        built_at = time.time_ns()
+        fingerprint = catalog_fingerprint(db)
+        self.publish(PRODUCTS, to_json(fetch_products(db)), built_at, fingerprint)
+        self.publish(CATEGORIES, to_json(fetch_categories(db)), built_at, fingerprint)
+        logger.info(
+            "Snapshot del catálogo publicado en %.0f ms",
+            (time.perf_counter() - start) * 1000,
+        )
+
+    def ensure(self) -> None:
+        """Construye el snapshot al arrancar si todavía no hay una versión publicada."""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if all(os.path.exists(self._pointer_path(r)) for r in RESOURCES):
+            return
+        with self._build_lock():
+            # Otro worker pudo construirlo mientras se esperaba el lock
+            if all(os.path.exists(self._pointer_path(r)) for r in RESOURCES):
+                return
+            with SessionLocal() as db:
+                self.build(db)
+
+    # -----------------------------
+    # RECONSTRUCCIÓN EN SEGUNDO PLANO
+    # -----------------------------
+
+    def request_rebuild(self, expired: bool = False) -> None:
+        """
+        Marca el snapshot como desactualizado y pide una reconstrucción.
+        Hasta que se publique una versión construida después de este pedido, este
+        worker deja de servirlo. ``expired`` indica que el pedido es solo por
+        antigüedad: se reconstruye únicamente si la huella del catálogo cambió.
+        """
+        if not self.enabled:
+            return
+        requested = time.time_ns()
+        with self._lock:
+            for resource in RESOURCES:
+                if not expired or resource not in self._stale:
+                    self._stale[resource] = requested
+            if not expired:
+                self._changed = True
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._rebuild_loop, name="catalog-snapshot", daemon=True
+                )
+                self._thread.start()
+        self._pending.set()
+
+    def _is_fresh(self, requested: Dict[str, int]) -> bool:
+        """True si cada recurso tiene una versión construida después de su pedido."""
+        for resource, requested_at in requested.items():
+            pointer = self._read_pointer(resource)
+            if pointer is None or pointer.built_at <= requested_at:
+                return False
+        return True
+
+    def _refresh(self, db, requested: Dict[str, int], changed: bool) -> None:
+        """Reconstruye, o solo renueva los punteros si es por antigüedad y la huella no cambió."""
+        if not changed:
+            built_at = time.time_ns()
+            fingerprint = catalog_fingerprint(db)
+            pointers = {r: self._read_pointer(r) for r in requested}
+            if all(p and p.fingerprint == fingerprint for p in pointers.values()):
+                for resource, pointer in pointers.items():
+                    self._write_pointer(resource, pointer._replace(built_at=built_at))
+                logger.info("Snapshot del catálogo sin cambios, se renueva el puntero")
+                return
+        self.build(db)
+
+    def _rebuild_loop(self) -> None:
+        """Agrupa los cambios seguidos (debounce) y reconstruye una vez por ráfaga."""
+        while True:
+            self._pending.wait()
+            time.sleep(SNAPSHOT_DEBOUNCE)
+            self._pending.clear()
+            with self._lock:
+                requested = dict(self._stale)
+                changed = self._changed
+                self._changed = False
+            if not requested:
+                continue
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with self._build_lock():
+                    # Otro worker del host ya publicó una versión posterior al pedido
+                    if self._is_fresh(requested):
+                        continue
+                    with SessionLocal() as db:
+                        self._refresh(db, requested, changed)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("No se pudo reconstruir el snapshot del catálogo")
+                with self._lock:
+                    self._changed = self._changed or changed
+                time.sleep(SNAPSHOT_RETRY)
+                self._pending.set()
+
+    # -----------------------------
+    # LECTURA
+    # -----------------------------
+
+    def get(self, resource: str) -> Optional[SnapshotFile]:
+        """
+        Devuelve la versión vigente del recurso, volviendo a mapear el archivo si el
+        puntero cambió. None si está deshabilitado, no hay versión, es anterior al
+        último pedido de reconstrucción o supera CATALOG_SNAPSHOT_MAX_AGE.
+        """
+        if not self.enabled:
+            return None
+        mtime = self._pointer_mtime(resource)
+        if mtime is None:
+            return None
+        current = self._mapped.get(resource)
+        if current is None or current[0] != mtime:
+            current = self._load(resource, mtime)
+            if current is None:
+                return None
+        snapshot = current[1]
+
+        requested = self._stale.get(resource)
+        if requested is not None:
+            if snapshot.built_at <= requested:
+                return None
+            with self._lock:
+                if self._stale.get(resource) == requested:
+                    del self._stale[resource]
+        if time.time_ns() - snapshot.built_at > SNAPSHOT_MAX_AGE * 1e9:
+            logger.info(
+                "Snapshot de %s con más de %.0f s, se verifica contra la base",
+                resource,
+                SNAPSHOT_MAX_AGE,
+            )
+            self.request_rebuild(expired=True)
+            return None
+        return snapshot
+
+    def _load(self, resource: str, mtime: int) -> Optional[Tuple[int, SnapshotFile]]:
+        """Mapea la versión apuntada; el mapa anterior se libera al no quedar referencias."""
+        with self._lock:
+            try:
+                pointer = self._read_pointer(resource)
+                if pointer is None:
+                    raise FileNotFoundError(self._pointer_path(resource))
+                version = pointer.version
+                path = self._data_path(resource, version)
+                body = _map(path)
+                encoded = {
+                    name.rsplit(".", 1)[1]: _map(name)
+                    for name in glob.glob(f"{path}.*")
+                }
+            except (FileNotFoundError, ValueError):
+                logger.warning("Snapshot de %s no disponible", resource)
+                return None
+            loaded = (
+                mtime,
+                SnapshotFile(
+                    version,
+                    body,
+                    f'"{version}"',
+                    encoded,
+                    pointer.built_at,
+                    pointer.fingerprint,
+                ),
+            )
+            self._mapped[resource] = loaded
+        return loaded
+
+
+catalog_snapshot = CatalogSnapshot(SNAPSHOT_DIR)
@@ -0,0 +1,579 @@
+"""Carga y exportación masiva del catálogo (CSV o NDJSON) sin pasar por la API.
+
+Uso:
+    python -m app.cli importar categorias categorias.csv
+    python -m app.cli importar productos productos.ndjson --lote 2000
+    python -m app.cli importar variantes variantes.csv
+    python -m app.cli exportar productos productos.ndjson
+    python -m app.cli exportar variantes - --formato csv > variantes.csv
+
+Los archivos se leen y escriben fila a fila, y se procesan en lotes de
+``--lote`` filas, cada uno en su propia transacción: la memoria no crece
+con el tamaño del archivo. La importación es un upsert por clave natural:
+
+  - categorias: nombre_categoria
+  - productos:  nombre_producto (la categoría por ``categoria`` = nombre,
+                o ``categoria_id``)
+  - variantes:  producto + color + talla (el producto por ``producto`` =
+                nombre_producto, o ``producto_id``); el SKU se genera con
+                generar_sku si la fila no lo trae
+
+Las filas inválidas se omiten y se informan con su número de línea. Al
+terminar se purga el cache del catálogo una sola vez y, si está habilitado,
+se publica un snapshot nuevo. No se emiten eventos SSE: los clientes se
+ponen al día con /changes.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+from sqlalchemy import bindparam, insert, or_, select, update
+from sqlalchemy.engine import Connection
+from app.cache.cache_utils import (
+    invalidate_pattern,
+    CATEGORIES,
+    CATEGORY,
+    PRODUCTS,
+    PRODUCT,
+    VARIANTS,
+    VARIANT,
+)
+from app.cache.snapshot import catalog_snapshot
+from app.database import SessionLocal, engine
+from app.functions.crud_products import precio_efectivo
+from app.functions.crud_sync import SYNC_OVERLAP
+from app.functions.crud_variants import generar_sku, normalizar_sku
+from app.migrations import product_aggregate_values
+from app.models import Categoria, Producto, VarianteProducto
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+FIELDS = {
+    "categorias": ["nombre_categoria", "logo_categoria"],
+    "productos": [
+        "nombre_producto",
+        "descripcion_producto",
+        "precio_producto",
+        "precio_oferta_producto",
+        "imagen_url_producto",
+        "activo",
+        "categoria",
+    ],
+    "variantes": ["producto", "color", "talla", "stock_variante_producto", "sku"],
+}
+
+
+class RowError(ValueError):
+    """Fila del archivo que no se puede importar."""
+
+
+# -----------------------------
+# LECTURA Y ESCRITURA
+# -----------------------------
+
+
+def detect_format(path: str, formato: Optional[str]) -> str:
+    """csv o ndjson, según --formato o la extensión del archivo."""
+    if formato:
+        return formato
+    if path.lower().endswith(".csv"):
+        return "csv"
+    if path.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    raise SystemExit(f"No se reconoce el formato de '{path}': use --formato")
+
+
+@contextmanager
+def open_text(path: str, mode: str) -> Iterator[TextIO]:
+    """Abre ``path`` (o stdin/stdout si es '-') en modo texto UTF-8."""
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    with open(path, mode, encoding="utf-8", newline="") as f:
+        yield f
+
+
+def read_rows(
+    f: TextIO, formato: str, stats: "ImportStats"
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Genera (número de línea, fila) sin cargar el archivo completo."""
+    if formato == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_num, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            stats.reject(line_num, RowError(f"JSON inválido ({e})"))
+            continue
+        if not isinstance(row, dict):
+            stats.reject(line_num, RowError("se esperaba un objeto JSON"))
+            continue
+        yield line_num, row
+
+
+def batches(rows: Iterable, size: int) -> Iterator[List]:
+    """Agrupa ``rows`` en listas de hasta ``size`` elementos."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+# -----------------------------
+# CONVERSIÓN DE CAMPOS
+# -----------------------------
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _text(row: Dict[str, Any], field: str) -> str:
+    value = row.get(field)
+    if _blank(value):
+        raise RowError(f"falta {field}")
+    return str(value).strip()
+
+
+def _number(row: Dict[str, Any], field: str, kind=float, required: bool = True):
+    value = row.get(field)
+    if _blank(value):
+        if required:
+            raise RowError(f"falta {field}")
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError) as e:
+        raise RowError(f"{field} inválido: {value!r}") from e
+
+
+def _bool(row: Dict[str, Any], field: str, default: bool = True) -> bool:
+    value = row.get(field)
+    if _blank(value):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "si", "sí", "yes")
+
+
+# -----------------------------
+# UPSERT POR LOTES
+# -----------------------------
+
+
+def _apply(
+    conn: Connection, table, by_key: Dict[Any, Dict[str, Any]], existing: Dict[Any, int]
+) -> Tuple[int, int]:
+    """Inserta las filas nuevas y actualiza las existentes con un executemany cada una."""
+    new = [values for key, values in by_key.items() if key not in existing]
+    changed = [
+        {"_id": existing[key], **values}
+        for key, values in by_key.items()
+        if key in existing
+    ]
+    if new:
+        conn.execute(insert(table), new)
+    if changed:
+        conn.execute(update(table).where(table.c.id == bindparam("_id")), changed)
+    return len(new), len(changed)
+
+
+def upsert_categories(
+    conn: Connection, rows: List[Tuple[int, Dict[str, Any]]], stats: "ImportStats"
+) -> None:
+    """Upsert de categorías por nombre_categoria."""
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for line_num, row in rows:
+        try:
+            nombre = _text(row, "nombre_categoria")
+            by_name[nombre] = {
+                "nombre_categoria": nombre,
+                "logo_categoria": _text(row, "logo_categoria"),
+            }
+        except RowError as e:
+            stats.reject(line_num, e)
+
+    existing = dict(
+        conn.execute(
+            select(Categoria.nombre_categoria, Categoria.id).where(
+                Categoria.nombre_categoria.in_(by_name)
+            )
+        ).all()
+    )
+    stats.add(*_apply(conn, Categoria.__table__, by_name, existing))
+
+
+def upsert_products(
+    conn: Connection,
+    rows: List[Tuple[int, Dict[str, Any]]],
+    stats: "ImportStats",
+    category_ids: Dict[str, int],
+) -> None:
+    """Upsert de productos por nombre_producto; resuelve la categoría por nombre o ID."""
+    names = {
+        str(row["categoria"]).strip()
+        for _, row in rows
+        if not _blank(row.get("categoria"))
+    } - category_ids.keys()
+    if names:
+        category_ids.update(
+            conn.execute(
+                select(Categoria.nombre_categoria, Categoria.id).where(
+                    Categoria.nombre_categoria.in_(names)
+                )
+            ).all()
+        )
+    known_ids = set(category_ids.values())
+    wanted_ids = {
+        int(row["categoria_id"])
+        for _, row in rows
+        if _blank(row.get("categoria")) and str(row.get("categoria_id", "")).isdigit()
+    } - known_ids
+    if wanted_ids:
+        known_ids |= set(
+            conn.scalars(select(Categoria.id).where(Categoria.id.in_(wanted_ids)))
+        )
+
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for line_num, row in rows:
+        try:
+            if not _blank(row.get("categoria")):
+                categoria = str(row["categoria"]).strip()
+                if categoria not in category_ids:
+                    raise RowError(f"no existe la categoría '{categoria}'")
+                categoria_id = category_ids[categoria]
+            else:
+                categoria_id = _number(row, "categoria_id", int)
+                if categoria_id not in known_ids:
+                    raise RowError(f"no existe la categoría {categoria_id}")
+            nombre = _text(row, "nombre_producto")
+            precio = _number(row, "precio_producto")
+            oferta = _number(row, "precio_oferta_producto", required=False)
+            by_name[nombre] = {
+                "nombre_producto": nombre,
+                "descripcion_producto": _text(row, "descripcion_producto"),
+                "precio_producto": precio,
+                "precio_oferta_producto": oferta,
+                "precio_efectivo": precio_efectivo(precio, oferta),
+                "imagen_url_producto": _text(row, "imagen_url_producto"),
+                "activo": _bool(row, "activo"),
+                "categoria_id": categoria_id,
+            }
+        except RowError as e:
+            stats.reject(line_num, e)
+
+    existing = dict(
+        conn.execute(
+            select(Producto.nombre_producto, Producto.id).where(
+                Producto.nombre_producto.in_(by_name)
+            )
+        ).all()
+    )
+    stats.add(*_apply(conn, Producto.__table__, by_name, existing))
+
+
+def upsert_variants(
+    conn: Connection, rows: List[Tuple[int, Dict[str, Any]]], stats: "ImportStats"
+) -> None:
+    """
+    Upsert de variantes por (producto, color, talla), con los SKU nuevos generados
+    en lote, y recálculo de los agregados de los productos tocados.
+    """
+    names = {
+        str(row["producto"]).strip()
+        for _, row in rows
+        if not _blank(row.get("producto"))
+    }
+    ids = {
+        int(row["producto_id"])
+        for _, row in rows
+        if _blank(row.get("producto")) and str(row.get("producto_id", "")).isdigit()
+    }
+    product_ids: Dict[str, int] = {}
+    known_ids: Set[int] = set()
+    if names or ids:
+        for product_id, nombre in conn.execute(
+            select(Producto.id, Producto.nombre_producto).where(
+                or_(Producto.nombre_producto.in_(names), Producto.id.in_(ids))
+            )
+        ):
+            product_ids[nombre] = product_id
+            known_ids.add(product_id)
+
+    by_key: Dict[Tuple[int, str, str], Dict[str, Any]] = {}
+    lines: Dict[Tuple[int, str, str], int] = {}
+    for line_num, row in rows:
+        try:
+            if not _blank(row.get("producto")):
+                producto = str(row["producto"]).strip()
+                if producto not in product_ids:
+                    raise RowError(f"no existe el producto '{producto}'")
+                producto_id = product_ids[producto]
+            else:
+                producto_id = _number(row, "producto_id", int)
+                if producto_id not in known_ids:
+                    raise RowError(f"no existe el producto {producto_id}")
+            values = {
+                "producto_id": producto_id,
+                "color": _text(row, "color"),
+                "talla": _text(row, "talla"),
+                "stock_variante_producto": _number(row, "stock_variante_producto", int),
+            }
+            if not _blank(row.get("sku")):
+                values["sku"] = normalizar_sku(str(row["sku"]))
+            key = (producto_id, values["color"], values["talla"])
+            by_key[key] = values
+            lines[key] = line_num
+        except RowError as e:
+            stats.reject(line_num, e)
+
+    existing = {
+        (producto_id, color, talla): variant_id
+        for variant_id, producto_id, color, talla in conn.execute(
+            select(
+                VarianteProducto.id,
+                VarianteProducto.producto_id,
+                VarianteProducto.color,
+                VarianteProducto.talla,
+            ).where(VarianteProducto.producto_id.in_({key[0] for key in by_key}))
+        )
+    }
+
+    # Un SKU del archivo que ya es de otra variante (o repetido en el lote) se
+    # rechaza aquí, antes de que el índice único aborte todo el lote
+    skus = {values["sku"] for values in by_key.values() if "sku" in values}
+    sku_owner: Dict[str, int] = {}
+    if skus:
+        sku_owner = dict(
+            conn.execute(
+                select(VarianteProducto.sku, VarianteProducto.id).where(
+                    VarianteProducto.sku.in_(skus)
+                )
+            ).all()
+        )
+    seen: Set[str] = set()
+    for key, values in list(by_key.items()):
+        sku = values.get("sku")
+        if sku is None:
+            continue
+        owner = sku_owner.get(sku)
+        if sku in seen or (owner is not None and owner != existing.get(key)):
+            stats.reject(
+                lines[key], RowError(f"el SKU {sku} ya pertenece a otra variante")
+            )
+            del by_key[key]
+            continue
+        seen.add(sku)
+
+    for key, values in by_key.items():
+        if key not in existing and "sku" not in values:
+            values["sku"] = generar_sku(*key)
+
+    touched = {key[0] for key in by_key}
+    # executemany exige las mismas columnas en cada fila: actualizaciones con y sin SKU aparte
+    with_sku = {k: v for k, v in by_key.items() if "sku" in v or k not in existing}
+    without_sku = {k: v for k, v in by_key.items() if k not in with_sku}
+    inserted, updated = _apply(conn, VarianteProducto.__table__, with_sku, existing)
+    updated += _apply(conn, VarianteProducto.__table__, without_sku, existing)[1]
+    stats.add(inserted, updated)
+
+    if touched:
+        conn.execute(
+            update(Producto)
+            .where(Producto.id.in_(touched))
+            .values(**product_aggregate_values())
+        )
+
+
+# -----------------------------
+# IMPORTACIÓN Y EXPORTACIÓN
+# -----------------------------
+
+
+class ImportStats:
+    """Contadores de la importación."""
+
+    MAX_REPORTED = 20
+
+    def __init__(self):
+        self.insertados = 0
+        self.actualizados = 0
+        self.rechazados = 0
+        self.lotes_confirmados = 0
+
+    def add(self, inserted: int, updated: int) -> None:
+        self.insertados += inserted
+        self.actualizados += updated
+
+    def reject(self, line_num: int, error: Exception) -> None:
+        self.rechazados += 1
+        if self.rechazados <= self.MAX_REPORTED:
+            logger.warning("Línea %s omitida: %s", line_num, error)
+
+
+def import_file(
+    resource: str,
+    path: str,
+    formato: str,
+    batch_size: int,
+    stats: Optional[ImportStats] = None,
+) -> ImportStats:
+    """Importa ``path`` en lotes de ``batch_size`` filas, un lote por transacción."""
+    stats = stats if stats is not None else ImportStats()
+    category_ids: Dict[str, int] = {}
+    start = time.perf_counter()
+    with open_text(path, "r") as f:
+        for batch in batches(read_rows(f, formato, stats), batch_size):
+            batch_start = time.perf_counter()
+            with engine.begin() as conn:
+                if resource == "categorias":
+                    upsert_categories(conn, batch, stats)
+                elif resource == "productos":
+                    upsert_products(conn, batch, stats, category_ids)
+                else:
+                    upsert_variants(conn, batch, stats)
+            stats.lotes_confirmados += 1
+            elapsed = time.perf_counter() - batch_start
+            if elapsed > SYNC_OVERLAP.total_seconds():
+                # Filas con updated_at anterior al 'hasta' que /changes ya pudo entregar
+                logger.warning(
+                    "%s: el lote tardó %.0f s, más que SYNC_OVERLAP_SECONDS=%.0f; "
+                    "reducir --lote o avisar a los clientes que resincronicen",
+                    resource,
+                    elapsed,
+                    SYNC_OVERLAP.total_seconds(),
+                )
+            logger.info(
+                "%s: %s insertados, %s actualizados, %s omitidos (%.0f filas/s)",
+                resource,
+                stats.insertados,
+                stats.actualizados,
+                stats.rechazados,
+                (stats.insertados + stats.actualizados + stats.rechazados)
+                / max(time.perf_counter() - start, 1e-9),
+            )
+    return stats
+
+
+def export_query(resource: str):
+    """SELECT de exportación con los mismos campos que acepta la importación."""
+    if resource == "categorias":
+        return select(Categoria.nombre_categoria, Categoria.logo_categoria).order_by(
+            Categoria.id
+        )
+    if resource == "productos":
+        return (
+            select(
+                Producto.nombre_producto,
+                Producto.descripcion_producto,
+                Producto.precio_producto,
+                Producto.precio_oferta_producto,
+                Producto.imagen_url_producto,
+                Producto.activo,
+                Categoria.nombre_categoria.label("categoria"),
+            )
+            .outerjoin(Categoria, Producto.categoria_id == Categoria.id)
+            .order_by(Producto.id)
+        )
+    return (
+        select(
+            Producto.nombre_producto.label("producto"),
+            VarianteProducto.color,
+            VarianteProducto.talla,
+            VarianteProducto.stock_variante_producto,
+            VarianteProducto.sku,
+        )
+        .join(Producto, VarianteProducto.producto_id == Producto.id)
+        .order_by(VarianteProducto.id)
+    )
+
+
+def export_file(resource: str, path: str, formato: str, batch_size: int) -> int:
+    """Escribe el recurso en ``path`` leyendo la base de datos con un cursor en streaming."""
+    count = 0
+    with engine.connect() as conn, open_text(path, "w") as f:
+        result = conn.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(export_query(resource))
+        writer = None
+        if formato == "csv":
+            writer = csv.DictWriter(f, fieldnames=FIELDS[resource])
+            writer.writeheader()
+        for row in result.mappings():
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+            count += 1
+    logger.info("%s: %s filas exportadas", resource, count)
+    return count
+
+
+def purge_catalog_cache() -> None:
+    """Purga todo el cache del catálogo y publica un snapshot nuevo (si está habilitado)."""
+    for resource in (CATEGORIES, CATEGORY, PRODUCTS, PRODUCT, VARIANTS, VARIANT):
+        invalidate_pattern(resource)
+    if catalog_snapshot.enabled:
+        with SessionLocal() as db:
+            catalog_snapshot.build(db)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli", description="Carga y exportación masiva del catálogo"
+    )
+    parser.add_argument("accion", choices=("importar", "exportar"))
+    parser.add_argument("recurso", choices=tuple(FIELDS))
+    parser.add_argument("archivo", help="ruta del archivo, o '-' para stdin/stdout")
+    parser.add_argument("--formato", choices=("csv", "ndjson"))
+    parser.add_argument("--lote", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument(
+        "--sin-purga",
+        action="store_true",
+        help="no purgar el cache al terminar la importación",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s › %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        stream=sys.stderr,
+    )
+    engine.echo = False
+    formato = detect_format(args.archivo, args.formato)
+
+    if args.accion == "exportar":
+        export_file(args.recurso, args.archivo, formato, args.lote)
+        return 0
+
+    stats = ImportStats()
+    try:
+        import_file(args.recurso, args.archivo, formato, args.lote, stats)
+    finally:
+        # También si la importación se interrumpe: los lotes ya confirmados quedan en la base
+        if stats.lotes_confirmados and (stats.insertados or stats.actualizados):
+            if args.sin_purga:
+                logger.info("Purga del cache omitida (--sin-purga)")
+            else:
+                purge_catalog_cache()
+                logger.info("Cache del catálogo purgado")
+    return 1 if stats.rechazados else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
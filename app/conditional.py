@@ -0,0 +1,89 @@
+"""GET condicional: ETag, If-None-Match (304) y Cache-Control para las lecturas del catálogo.
+
+Hay dos caminos para responder 304:
+  - ``cached_not_modified``: antes de tocar la base de datos, compara el
+    If-None-Match con el ETag guardado junto a la entrada del cache
+    (``<clave>:etag``); si coincide, no se lee ni se serializa el cuerpo.
+  - ``ConditionalGetMiddleware``: para el resto de respuestas GET con ETag
+    (calculado del cuerpo ya renderizado), descarta el cuerpo y envía 304.
+"""
+
+import os
+from typing import Optional
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.cache.cache_utils import get_etag
+
+CACHE_CONTROL = os.getenv(
+    "CACHE_CONTROL",
+    f"public, max-age={int(os.getenv('CACHE_CONTROL_MAX_AGE', '30'))}",
+)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True si algún ETag de If-None-Match coincide (comparación débil, RFC 9110)."""
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """Respuesta 304 con los mismos validadores que tendría la respuesta completa."""
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def cached_not_modified(request: Request, key: str) -> Optional[Response]:
+    """
+    Devuelve un 304 si el If-None-Match coincide con el ETag guardado para ``key``.
+    Solo lee la clave del ETag; None si no hay encabezado, ETag o no coincide.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etag = get_etag(key)
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return None
+
+
+class ConditionalGetMiddleware:
+    """Agrega Cache-Control a los GET con ETag y convierte en 304 los que ya tiene el cliente."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        skip_body = False
+
+        async def send_conditional(message: Message) -> None:
+            nonlocal skip_body
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if message["status"] == 200 and etag:
+                    headers.setdefault("cache-control", CACHE_CONTROL)
+                    if if_none_match and etag_matches(if_none_match, etag):
+                        skip_body = True
+                        message["status"] = 304
+                        for name in ("content-length", "content-type"):
+                            if name in headers:
+                                del headers[name]
+                        await send(message)
+                        await send({"type": "http.response.body", "body": b""})
+                        return
+            elif skip_body:
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_conditional)
@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from app.metrics import TimedQueuePool
+from app.querylog import install_query_log
 
 load_dotenv()
 
@@ -12,7 +14,24 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL no está definida en el archivo .env")
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Por worker; app.server los calcula a partir del presupuesto global de conexiones
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# QueuePool con medición del tiempo de espera del checkout (sqlite en memoria usa su propio pool)
+pool_options = (
+    {}
+    if ":memory:" in DATABASE_URL
+    else {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+)
+engine = create_engine(DATABASE_URL, echo=True, **pool_options)
+install_query_log(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -0,0 +1,177 @@
+"""Lecturas con SQLAlchemy Core (sin ORM) para construir los esquemas de salida.
+
+Las consultas devuelven tuplas planas y los esquemas se construyen con
+``model_construct``: los datos vienen de columnas tipadas de la base de datos,
+así que no hace falta el mapa de identidad del ORM ni volver a validarlos.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models import Categoria, Producto, VarianteProducto
+from app.schemas import CategoryOut, ProductOut, VarianteOut
+
+CATEGORY_COLUMNS = (
+    Categoria.id,
+    Categoria.nombre_categoria,
+    Categoria.logo_categoria,
+)
+
+VARIANT_COLUMNS = (
+    VarianteProducto.id,
+    VarianteProducto.color,
+    VarianteProducto.talla,
+    VarianteProducto.stock_variante_producto,
+    VarianteProducto.sku,
+    VarianteProducto.producto_id,
+    VarianteProducto.created_at,
+    VarianteProducto.updated_at,
+)
+
+PRODUCT_COLUMNS = (
+    Producto.id,
+    Producto.nombre_producto,
+    Producto.descripcion_producto,
+    Producto.precio_producto,
+    Producto.precio_oferta_producto,
+    Producto.imagen_url_producto,
+    Producto.activo,
+    Producto.stock_total,
+    Producto.variantes_con_stock,
+    Producto.precio_efectivo,
+    Producto.created_at,
+    Producto.updated_at,
+)
+
+
+# -----------------------------
+# CONSTRUCCIÓN DESDE TUPLAS
+# -----------------------------
+
+
+def category_from_row(row) -> CategoryOut:
+    """Construye un CategoryOut desde una tupla de CATEGORY_COLUMNS."""
+    cat_id, nombre, logo = row
+    return CategoryOut.model_construct(
+        id=cat_id, nombre_categoria=nombre, logo_categoria=logo
+    )
+
+
+def variant_from_row(row) -> VarianteOut:
+    """Construye un VarianteOut desde una tupla de VARIANT_COLUMNS."""
+    var_id, color, talla, stock, sku, producto_id, created_at, updated_at = row
+    return VarianteOut.model_construct(
+        id=var_id,
+        color=color,
+        talla=talla,
+        stock_variante_producto=stock,
+        sku=sku,
+        producto_id=producto_id,
+        created_at=created_at,
+        updated_at=updated_at,
+    )
+
+
+# -----------------------------
+# CONSULTAS
+# -----------------------------
+
+
+def fetch_categories(db: Session, *criteria) -> List[CategoryOut]:
+    """Devuelve las categorías que cumplan los criterios, ordenadas por ID."""
+    stmt = select(*CATEGORY_COLUMNS).where(*criteria).order_by(Categoria.id)
+    return [category_from_row(row) for row in db.execute(stmt)]
+
+
+def fetch_variants(db: Session, *criteria) -> List[VarianteOut]:
+    """Devuelve las variantes que cumplan los criterios, ordenadas por ID."""
+    stmt = select(*VARIANT_COLUMNS).where(*criteria).order_by(VarianteProducto.id)
+    return [variant_from_row(row) for row in db.execute(stmt)]
+
+
+def fetch_products(db: Session, *criteria) -> List[ProductOut]:
+    """
+    Devuelve los productos que cumplan los criterios con su categoría y variantes.
+    Los criterios deben referirse a columnas de Producto.
+    Usa dos consultas: productos + categoría (LEFT JOIN) y las variantes de esos productos.
+    """
+    stmt = (
+        select(*PRODUCT_COLUMNS, *CATEGORY_COLUMNS)
+        .outerjoin(Categoria, Producto.categoria_id == Categoria.id)
+        .where(*criteria)
+        .order_by(Producto.id)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return []
+
+    n_product = len(PRODUCT_COLUMNS)
+    variantes: Dict[int, List[VarianteOut]] = defaultdict(list)
+    var_stmt = (
+        select(*VARIANT_COLUMNS)
+        .join(Producto, VarianteProducto.producto_id == Producto.id)
+        .where(*criteria)
+        .order_by(VarianteProducto.id)
+    )
+    for row in db.execute(var_stmt):
+        variantes[row[5]].append(variant_from_row(row))
+
+    out = []
+    for row in rows:
+        (
+            prod_id,
+            nombre,
+            descripcion,
+            precio,
+            precio_oferta,
+            imagen,
+            activo,
+            stock_total,
+            variantes_con_stock,
+            precio_efectivo,
+            created_at,
+            updated_at,
+        ) = row[:n_product]
+        categoria = (
+            category_from_row(row[n_product:]) if row[n_product] is not None else None
+        )
+        out.append(
+            ProductOut.model_construct(
+                id=prod_id,
+                nombre_producto=nombre,
+                descripcion_producto=descripcion,
+                precio_producto=precio,
+                precio_oferta_producto=precio_oferta,
+                imagen_url_producto=imagen,
+                activo=activo,
+                stock_total=stock_total,
+                variantes_con_stock=variantes_con_stock,
+                precio_efectivo=precio_efectivo,
+                categoria=categoria,
+                variantes=variantes.get(prod_id, []),
+                created_at=created_at,
+                updated_at=updated_at,
+            )
+        )
+    return out
+
+
+def fetch_category_summary(db: Session) -> Dict[int, Tuple[int, int]]:
+    """
+    Cuenta productos activos y suma su stock por categoría con un solo GROUP BY.
+    Devuelve {categoria_id: (productos_activos, stock_total)}.
+    """
+    stmt = (
+        select(
+            Producto.categoria_id,
+            func.count(Producto.id),
+            func.coalesce(func.sum(Producto.stock_total), 0),
+        )
+        .where(Producto.activo.is_(True), Producto.categoria_id.is_not(None))
+        .group_by(Producto.categoria_id)
+    )
+    return {
+        category_id: (productos, int(stock))
+        for category_id, productos, stock in db.execute(stmt)
+    }
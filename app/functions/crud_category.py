@@ -1,20 +1,34 @@
 """CRUD para manejar las operaciones en la base de datos de categorias"""
 
 import logging
-from typing import List
+from typing import Dict, List
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import delete, func
 from sqlalchemy.orm import Session
-from app.models import Categoria
-from app.schemas import CategoryCreate, CategoryOut
+from app.functions.core_reads import fetch_categories, fetch_category_summary
+from app.admission import admitted
+from app.functions.crud_products import (
+    delete_products_where,
+    invalidate_deleted_products,
+)
+from app.functions.loader import BatchLoader
+from app.models import Categoria, Producto
+from app.schemas import CategoryCreate, CategoryOut, CategorySummary
 from app.cache.cache_for_category import (
     get_categories_from_cache,
     set_categories_cache,
-    get_category_from_cache_by_id,
     set_category_cache_by_id,
+    get_categories_from_cache_by_ids,
+    set_categories_cache_by_id,
     get_category_search_cache,
     set_category_search_cache,
+    get_category_summary_cache,
+    get_category_summary_epoch,
+    set_category_summary_cache,
+    drop_category_summary,
 )
+from app.cache.maintenance import after_commit
+from app.cache.snapshot import catalog_snapshot
 from app.cache.cache_utils import (
     invalidate_cache,
     invalidate_pattern,
@@ -35,28 +49,67 @@ def list_categories(db: Session) -> List[CategoryOut]:
 
     logger.info("❌ Cache MISS: consultando base de datos")
 
-    orm_list = db.query(Categoria).all()
-    out_list = [CategoryOut.model_validate(c) for c in orm_list]
+    with admitted():
+        out_list = fetch_categories(db)
     set_categories_cache(out_list, ttl=DEFAULT_TTL)
     return out_list
 
 
-def get_category_by_id(db: Session, category_id: int) -> CategoryOut:
-    """Devuelve una categoría por ID, con cache individual."""
-    cat = get_category_from_cache_by_id(category_id)
-    if cat:
-        logger.info("✅ Cache HIT: categoría %s desde Redis", category_id)
-        return cat
+def get_category_summary(db: Session) -> List[CategorySummary]:
+    """Devuelve cada categoría con sus productos activos y stock total."""
+    counts = get_category_summary_cache()
+    if counts is not None:
+        logger.info("✅ Cache HIT: resumen de categorías desde Redis")
+    else:
+        logger.info("❌ Cache MISS: resumen de categorías en base de datos")
+        epoch = get_category_summary_epoch()
+        counts = fetch_category_summary(db)
+        set_category_summary_cache(counts, epoch, ttl=DEFAULT_TTL)
+
+    out = []
+    for cat in list_categories(db):
+        productos, stock = counts.get(cat.id, (0, 0))
+        out.append(
+            CategorySummary.model_construct(
+                id=cat.id,
+                nombre_categoria=cat.nombre_categoria,
+                logo_categoria=cat.logo_categoria,
+                productos_activos=productos,
+                stock_total=stock,
+            )
+        )
+    return out
 
-    orm_cat = db.query(Categoria).filter(Categoria.id == category_id).first()
-    if not orm_cat:
+
+def load_categories_by_ids(
+    db: Session, category_ids: List[int]
+) -> Dict[int, CategoryOut]:
+    """Carga varias categorías: un MGET a Redis y un WHERE id IN (...) para las que falten."""
+    found = get_categories_from_cache_by_ids(category_ids)
+    if found:
+        logger.info("✅ Cache HIT: %s categorías desde Redis", len(found))
+
+    missing = [category_id for category_id in category_ids if category_id not in found]
+    if missing:
+        logger.info("❌ Cache MISS: categorías %s en base de datos", missing)
+        loaded = fetch_categories(db, Categoria.id.in_(missing))
+        set_categories_cache_by_id(loaded, ttl=DEFAULT_TTL)
+        found.update({category.id: category for category in loaded})
+    return found
+
+
+category_loader = BatchLoader(load_categories_by_ids)
+
+
+def get_category_by_id(db: Session, category_id: int) -> CategoryOut:
+    """Devuelve una categoría por ID, agrupando las búsquedas concurrentes en lotes."""
+    cat = category_loader.load(db, category_id)
+    if cat is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Categoría {category_id} no encontrada",
         )
-    out = CategoryOut.model_validate(orm_cat)
-    set_category_cache_by_id(out, ttl=DEFAULT_TTL)
-    return out
+    return cat
 
 
 def get_category_by_name(
@@ -65,19 +118,22 @@ def get_category_by_name(
     """Busca categorías que contengan el término en su nombre, ignorando mayúsculas y ordenando."""
     cached = get_category_search_cache(search_term)
 
-    if cached:
+    if cached is not None:
         logger.info("✅ Cache HIT: búsqueda '%s' en Redis", search_term)
         return cached
 
     logger.info("❌ Cache MISS: búsqueda '%s' en base de datos", search_term)
 
-    orm_list = (
-        db.query(Categoria)
-        .filter(func.lower(Categoria.nombre_categoria).like(f"%{search_term.lower()}%"))
-        .order_by(Categoria.nombre_categoria.asc())
-        .limit(limit)
-        .all()
-    )
+    with admitted():
+        orm_list = (
+            db.query(Categoria)
+            .filter(
+                func.lower(Categoria.nombre_categoria).like(f"%{search_term.lower()}%")
+            )
+            .order_by(Categoria.nombre_categoria.asc())
+            .limit(limit)
+            .all()
+        )
 
     if not orm_list:
         raise HTTPException(
@@ -99,10 +155,12 @@ def create_category(db: Session, cat_in: CategoryCreate) -> CategoryOut:
     db.commit()
     db.refresh(new)
 
-    invalidate_cache(resource=CATEGORIES)
-    new_out = CategoryOut.model_validate(new)
-    set_category_cache_by_id(new_out, ttl=DEFAULT_TTL)
-    invalidate_pattern(resource=CATEGORIES, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_cache(resource=CATEGORIES)
+        catalog_snapshot.request_rebuild()
+        new_out = CategoryOut.model_validate(new)
+        set_category_cache_by_id(new_out, ttl=DEFAULT_TTL)
+        invalidate_pattern(resource=CATEGORIES, pattern_suffix="search:*")
     return new_out
 
 
@@ -122,27 +180,43 @@ def update_category_by_id(
     db.commit()
     db.refresh(orm_cat)
 
-    invalidate_cache(resource=CATEGORIES)
-    invalidate_cache(resource=CATEGORY, resource_id=category_id)
+    with after_commit():
+        invalidate_cache(resource=CATEGORIES)
+        catalog_snapshot.request_rebuild()
+        invalidate_cache(resource=CATEGORY, resource_id=category_id)
 
-    updated = CategoryOut.model_validate(orm_cat)
-    set_category_cache_by_id(updated, ttl=DEFAULT_TTL)
-    invalidate_pattern(resource=CATEGORIES, pattern_suffix="search:*")
+        updated = CategoryOut.model_validate(orm_cat)
+        set_category_cache_by_id(updated, ttl=DEFAULT_TTL)
+        invalidate_pattern(resource=CATEGORIES, pattern_suffix="search:*")
     return updated
 
 
 def delete_category_by_id(db: Session, category_id: int) -> None:
-    """Elimina una categoría y purga su cache."""
-
-    orm_cat = db.query(Categoria).filter(Categoria.id == category_id).first()
-    if not orm_cat:
+    """
+    Elimina una categoría con sus productos y variantes usando DELETE por conjunto
+    (sin cargarlos en memoria) y purga solo las claves afectadas.
+    """
+    exists = db.query(Categoria.id).filter(Categoria.id == category_id).first()
+    if not exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Categoría {category_id} no encontrada",
         )
-    db.delete(orm_cat)
+    product_ids, variantes = delete_products_where(
+        db, Producto.categoria_id == category_id
+    )
+    db.execute(
+        delete(Categoria)
+        .where(Categoria.id == category_id)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
 
-    invalidate_cache(resource=CATEGORIES)
-    invalidate_cache(resource=CATEGORY, resource_id=category_id)
-    invalidate_pattern(resource=CATEGORIES, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_cache(resource=CATEGORIES)
+        catalog_snapshot.request_rebuild()
+        invalidate_cache(resource=CATEGORY, resource_id=category_id)
+        invalidate_pattern(resource=CATEGORIES, pattern_suffix="search:*")
+        drop_category_summary(category_id)
+        if product_ids:
+            invalidate_deleted_products(product_ids, variantes)
@@ -1,64 +1,151 @@
 """CRUD para manejar las operaciones en la base de datos de productos"""
 
 import logging
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import delete, func, select
 from sqlalchemy.orm import Session
-from app.functions.crud_variants import generar_sku
+from app.functions.crud_variants import con_stock, generar_sku
+from app.functions.crud_sync import (
+    registrar_eliminaciones,
+    RECURSO_PRODUCTO,
+    RECURSO_VARIANTE,
+)
+from app.functions.core_reads import fetch_products
+from app.admission import admitted
+from app.functions.loader import BatchLoader
 from app.models import Producto, VarianteProducto
 from app.schemas import ProductCreate, ProductOut
 
+from app.cache.cache_for_category import (
+    adjust_category_summary,
+    product_summary_deltas,
+)
 from app.cache.cache_for_products import (
     get_products_from_cache,
     set_products_cache,
-    get_product_from_cache_by_id,
     set_product_cache_by_id,
+    get_products_from_cache_by_ids,
+    set_products_cache_by_id,
     get_product_search_cache,
     set_product_search_cache,
 )
+from app.cache.events import (
+    publish_event,
+    PRODUCT_CREATED,
+    PRODUCT_UPDATED,
+    PRODUCT_DELETED,
+)
+from app.cache.maintenance import after_commit
+from app.cache.snapshot import catalog_snapshot
 from app.cache.cache_utils import (
+    make_key,
     invalidate_cache,
+    invalidate_keys,
     invalidate_pattern,
     DEFAULT_TTL,
     PRODUCT,
     PRODUCTS,
+    VARIANT,
+    VARIANTS,
+    VARIANT_SKU,
 )
 
 logger = logging.getLogger(__name__)
 
+# IDs por sentencia en los borrados por conjunto (SQL Server admite 2100 parámetros)
+DELETE_CHUNK_SIZE = 1000
+
+
+def product_filters(
+    en_stock: Optional[bool] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+) -> list:
+    """Traduce los filtros del listado a condiciones sobre los agregados de Producto."""
+    criteria = []
+    if en_stock is not None:
+        criteria.append(
+            Producto.variantes_con_stock > 0
+            if en_stock
+            else Producto.variantes_con_stock == 0
+        )
+    if precio_min is not None:
+        criteria.append(Producto.precio_efectivo >= precio_min)
+    if precio_max is not None:
+        criteria.append(Producto.precio_efectivo <= precio_max)
+    return criteria
+
+
+def list_filtered_products(
+    db: Session,
+    en_stock: Optional[bool] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+) -> List[ProductOut]:
+    """Devuelve los productos que cumplan los filtros de stock y precio efectivo."""
+    search_term = f"filtro:{en_stock}:{precio_min}:{precio_max}"
+    cached = get_product_search_cache(search_term)
+    if cached is not None:
+        logger.info("✅ Cache HIT: productos filtrados '%s' en Redis", search_term)
+        return cached
+
+    logger.info("❌ Cache MISS: productos filtrados '%s' en base de datos", search_term)
+    with admitted():
+        out = fetch_products(db, *product_filters(en_stock, precio_min, precio_max))
+    set_product_search_cache(out, search_term)
+    return out
+
 
 def list_products(db: Session) -> List[ProductOut]:
     """Devuelve todas los productos, intentando primero el cache."""
     cached = get_products_from_cache()
-    if cached:
+    if cached is not None:
         logger.info("✅ Cache HIT: productos desde Redis")
         return cached
 
     logger.info("❌ Cache MISS: consultando base de datos")
 
-    orm_list = db.query(Producto).all()
-    out = [ProductOut.model_validate(p) for p in orm_list]
+    with admitted():
+        out = fetch_products(db)
     set_products_cache(out, ttl=DEFAULT_TTL)
     return out
 
 
-def get_prodct(db: Session, product_id: int) -> ProductOut:
-    """Devuelve una producto por ID, con cache individual."""
-    cached = get_product_from_cache_by_id(product_id)
-    if cached:
-        logger.info("✅ Cache HIT: producto %s desde Redis", product_id)
-        return cached
+def load_products_by_ids(db: Session, product_ids: List[int]) -> Dict[int, ProductOut]:
+    """Carga varios productos: un MGET a Redis y un WHERE id IN (...) para los que falten."""
+    found = get_products_from_cache_by_ids(product_ids)
+    if found:
+        logger.info("✅ Cache HIT: %s productos desde Redis", len(found))
 
-    orm_product = db.query(Producto).filter(Producto.id == product_id).first()
-    if not orm_product:
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    if missing:
+        logger.info("❌ Cache MISS: productos %s en base de datos", missing)
+        loaded = fetch_products(db, Producto.id.in_(missing))
+        set_products_cache_by_id(loaded, ttl=DEFAULT_TTL)
+        found.update({product.id: product for product in loaded})
+    return found
+
+
+product_loader = BatchLoader(load_products_by_ids)
+
+
+def get_products_by_ids(db: Session, product_ids: List[int]) -> List[ProductOut]:
+    """Devuelve los productos pedidos, en el mismo orden (omite los que no existan)."""
+    unique = list(dict.fromkeys(product_ids))
+    found = load_products_by_ids(db, unique)
+    return [found[product_id] for product_id in unique if product_id in found]
+
+
+def get_prodct(db: Session, product_id: int) -> ProductOut:
+    """Devuelve una producto por ID, agrupando las búsquedas concurrentes en lotes."""
+    product = product_loader.load(db, product_id)
+    if product is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Producto {product_id} no encontrada",
         )
-    out = ProductOut.model_validate(orm_product)
-    set_product_cache_by_id(out, ttl=DEFAULT_TTL)
-    return out
+    return product
 
 
 def get_product_by_name(
@@ -66,31 +153,59 @@ def get_product_by_name(
 ) -> List[ProductOut]:
     """Busca productos que contengan el término en su nombre, ignorando mayúsculas y ordenando."""
     cached = get_product_search_cache(search_term)
-    if cached:
+    if cached is not None:
         logger.info("✅ Cache HIT: búsqueda '%s' en Redis", search_term)
         return cached
 
     logger.info("❌ Cache MISS: búsqueda '%s' en base de datos", search_term)
 
-    orm_list = (
-        db.query(Producto)
-        .filter(func.lower(Producto.nombre_producto).like(f"%{search_term.lower()}%"))
-        .order_by(Producto.nombre_producto.asc())
-        .limit(limit)
-        .all()
-    )
-
-    if not orm_list:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No se encontraron productos que coincidan con '{search_term}'",
-        )
+    # IDs en el orden de la búsqueda; luego categoría y variantes en lote (sin carga perezosa)
+    with admitted():
+        ids = db.scalars(
+            select(Producto.id)
+            .where(
+                func.lower(Producto.nombre_producto).like(f"%{search_term.lower()}%")
+            )
+            .order_by(Producto.nombre_producto.asc())
+            .limit(limit)
+        ).all()
+
+        if not ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No se encontraron productos que coincidan con '{search_term}'",
+            )
 
-    out = [ProductOut.model_validate(p) for p in orm_list]
+        by_id = {
+            product.id: product for product in fetch_products(db, Producto.id.in_(ids))
+        }
+    out = [by_id[product_id] for product_id in ids if product_id in by_id]
     set_product_search_cache(out, search_term)
     return out
 
 
+def precio_efectivo(precio: float, precio_oferta: Optional[float]) -> float:
+    """Precio al que se vende el producto: la oferta si existe, si no el precio normal."""
+    return precio_oferta if precio_oferta is not None else precio
+
+
+def summary_state(product: Producto) -> Tuple[Optional[int], bool, int]:
+    """Estado del producto que cuenta en el resumen por categoría."""
+    return (product.categoria_id, product.activo, product.stock_total)
+
+
+def publish_product_event(tipo: str, product: ProductOut) -> None:
+    """Publica el cambio de precio/estado de un producto para los clientes conectados."""
+    publish_event(
+        tipo,
+        id=product.id,
+        producto_id=product.id,
+        precio_producto=product.precio_producto,
+        precio_oferta_producto=product.precio_oferta_producto,
+        activo=product.activo,
+    )
+
+
 def create_product(db: Session, product_in: ProductCreate) -> ProductOut:
     """Crea un nuevo producto e invalida la lista en caché."""
     existing_product = (
@@ -102,7 +217,17 @@ def create_product(db: Session, product_in: ProductCreate) -> ProductOut:
             detail=f"Ya existe un producto con el nombre '{product_in.nombre_producto}'",
         )
 
-    new = Producto(**product_in.dict(exclude={"variantes"}))
+    variantes_in = product_in.variantes or []
+    new = Producto(
+        **product_in.dict(exclude={"variantes"}),
+        precio_efectivo=precio_efectivo(
+            product_in.precio_producto, product_in.precio_oferta_producto
+        ),
+        stock_total=sum(v.stock_variante_producto for v in variantes_in),
+        variantes_con_stock=sum(
+            con_stock(v.stock_variante_producto) for v in variantes_in
+        ),
+    )
     db.add(new)
     db.commit()
     db.refresh(new)
@@ -118,13 +243,17 @@ def create_product(db: Session, product_in: ProductCreate) -> ProductOut:
             db.add(new_variante)
         db.commit()
 
-    invalidate_cache(resource=PRODUCTS)
-    invalidate_pattern(resource=PRODUCTS, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_cache(resource=PRODUCTS)
+        catalog_snapshot.request_rebuild()
+        invalidate_pattern(resource=PRODUCTS, pattern_suffix="search:*")
+        adjust_category_summary(product_summary_deltas(None, summary_state(new)))
 
-    # Asegurarse de incluir las variantes si el modelo lo requiere
-    new_out = ProductOut.model_validate(new)
+        # Asegurarse de incluir las variantes si el modelo lo requiere
+        new_out = ProductOut.model_validate(new)
 
-    set_product_cache_by_id(new_out, ttl=DEFAULT_TTL)
+        set_product_cache_by_id(new_out, ttl=DEFAULT_TTL)
+        publish_product_event(PRODUCT_CREATED, new_out)
     return new_out
 
 
@@ -140,28 +269,106 @@ def update_product_by_id(
             detail=f"Producto {product_id} no encontrado",
         )
 
+    before = summary_state(orm_product)
     for k, v in product_in.dict(exclude_unset=True, exclude={"variantes"}).items():
         setattr(orm_product, k, v)
+    orm_product.precio_efectivo = precio_efectivo(
+        orm_product.precio_producto, orm_product.precio_oferta_producto
+    )
 
     db.commit()
     db.refresh(orm_product)
 
-    invalidate_cache(resource=PRODUCTS)
-    invalidate_cache(resource=PRODUCT, resource_id=product_id)
-    invalidate_pattern(resource=PRODUCTS, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_cache(resource=PRODUCTS)
+        catalog_snapshot.request_rebuild()
+        invalidate_cache(resource=PRODUCT, resource_id=product_id)
+        invalidate_pattern(resource=PRODUCTS, pattern_suffix="search:*")
+        adjust_category_summary(
+            product_summary_deltas(before, summary_state(orm_product))
+        )
 
-    out = ProductOut.model_validate(orm_product)
-    set_product_cache_by_id(out, ttl=DEFAULT_TTL)
+        out = ProductOut.model_validate(orm_product)
+        set_product_cache_by_id(out, ttl=DEFAULT_TTL)
+        publish_product_event(PRODUCT_UPDATED, out)
     return out
 
 
+def invalidate_deleted_products(
+    product_ids: List[int], variantes: List[Tuple[int, str]]
+) -> None:
+    """Purga las claves de productos y variantes eliminados (sin KEYS sobre todo el catálogo)."""
+    invalidate_cache(PRODUCTS)
+    catalog_snapshot.request_rebuild()
+    invalidate_pattern(PRODUCTS, "search:*")
+    keys = [make_key(PRODUCT, product_id) for product_id in product_ids]
+    if variantes:
+        invalidate_cache(VARIANTS)
+        invalidate_pattern(VARIANTS, "search:*")
+        for variant_id, sku in variantes:
+            keys.append(make_key(VARIANT, variant_id))
+            keys.append(make_key(VARIANT_SKU, sku))
+    invalidate_keys(keys)
+
+
+def delete_products_where(
+    db: Session, *criteria
+) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """
+    Elimina con sentencias DELETE por conjunto los productos que cumplan los criterios
+    y sus variantes, registrando tombstones. No hace commit.
+    Devuelve los IDs de productos y (id, sku) de variantes eliminados.
+    """
+    product_ids = list(db.execute(select(Producto.id).where(*criteria)).scalars())
+    if not product_ids:
+        return [], []
+
+    # Se borra exactamente lo leído (no se vuelven a evaluar los criterios): una
+    # fila que empiece a cumplirlos entre la lectura y el DELETE se quedaría sin
+    # tombstone ni invalidación. Por tramos, por el límite de parámetros de SQL Server
+    variantes: List[Tuple[int, str]] = []
+    for start in range(0, len(product_ids), DELETE_CHUNK_SIZE):
+        chunk = product_ids[start : start + DELETE_CHUNK_SIZE]
+        variantes.extend(
+            (variant_id, sku)
+            for variant_id, sku in db.execute(
+                select(VarianteProducto.id, VarianteProducto.sku).where(
+                    VarianteProducto.producto_id.in_(chunk)
+                )
+            )
+        )
+        db.execute(
+            delete(VarianteProducto)
+            .where(VarianteProducto.producto_id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(Producto)
+            .where(Producto.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+    registrar_eliminaciones(db, RECURSO_PRODUCTO, product_ids)
+    registrar_eliminaciones(db, RECURSO_VARIANTE, [v_id for v_id, _ in variantes])
+    return product_ids, variantes
+
+
 def delete_product(db: Session, product_id: int) -> None:
-    """Elimina un producto existente y limpia si cache"""
-    orm_product = db.query(Producto).get(product_id)
-    if not orm_product:
+    """Elimina un producto existente y sus variantes con DELETE por conjunto, y limpia su cache"""
+    before = db.execute(
+        select(Producto.categoria_id, Producto.activo, Producto.stock_total).where(
+            Producto.id == product_id
+        )
+    ).first()
+    if before is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    product_ids, variantes = delete_products_where(db, Producto.id == product_id)
+    if product_id not in product_ids:
+        # Otro borrado concurrente lo eliminó entre la lectura y el DELETE: ese ya
+        # descontó el producto del resumen
+        db.rollback()
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    db.delete(orm_product)
     db.commit()
-    invalidate_cache(PRODUCTS)
-    invalidate_cache(PRODUCT, product_id)
-    invalidate_pattern(PRODUCTS, "search:*")
+    with after_commit():
+        invalidate_deleted_products(product_ids, variantes)
+        adjust_category_summary(product_summary_deltas(tuple(before), None))
+        publish_event(PRODUCT_DELETED, id=product_id, producto_id=product_id)
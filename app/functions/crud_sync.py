@@ -0,0 +1,142 @@
+"""Sincronización incremental: cambios desde una fecha y registro de eliminaciones"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+from app.functions.core_reads import fetch_products, fetch_variants
+from app.models import Eliminacion, Producto, VarianteProducto
+from app.schemas import ProductChanges, VarianteChanges
+
+RECURSO_PRODUCTO = "producto"
+RECURSO_VARIANTE = "variante"
+
+# Margen que se resta al cursor devuelto. updated_at/deleted_at toman la hora de
+# la sentencia, no la del commit: una transacción que tarda más que este margen
+# entre su UPDATE y su COMMIT deja filas con una marca anterior al 'hasta' ya
+# entregado y los clientes no las ven. Es, por lo tanto, el tope de duración de
+# cualquier transacción que escriba el catálogo (incluidos los lotes de app.cli,
+# que avisan si lo superan). Los clientes deben aplicar los cambios de forma
+# idempotente (upsert), porque los del margen se repiten en cada consulta.
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv("SYNC_OVERLAP_SECONDS", "300")))
+
+# Tiempo que se guardan los tombstones. Un 'desde' más viejo ya no vería todas las
+# eliminaciones, así que se rechaza (410) y el cliente debe resincronizar completo
+# (sin 'desde': todo el catálogo y un 'hasta' para seguir de forma incremental).
+SYNC_RETENTION = timedelta(days=int(os.getenv("SYNC_RETENTION_DAYS", "30")))
+RECURSOS = (RECURSO_PRODUCTO, RECURSO_VARIANTE)
+# Tombstones vencidos que se borran con cada registro de eliminaciones, además de
+# tantos como se insertan: la tabla no crece más allá de la retención
+SYNC_PURGE_BATCH = int(os.getenv("SYNC_PURGE_BATCH", "500"))
+
+
+def registrar_eliminaciones(db: Session, recurso: str, ids: Iterable[int]) -> None:
+    """
+    Inserta tombstones en la transacción actual (se guardan con el commit del borrado)
+    y borra un lote de los vencidos.
+    """
+    rows = [{"recurso": recurso, "recurso_id": item_id} for item_id in ids]
+    if rows:
+        db.execute(insert(Eliminacion), rows)
+        purge_eliminaciones(db, SYNC_PURGE_BATCH + len(rows))
+
+
+def _db_now(db: Session) -> datetime:
+    """Hora actual de la base de datos, la misma fuente que created_at/updated_at."""
+    return db.execute(select(func.now(type_=DateTime(timezone=True)))).scalar_one()
+
+
+def purge_eliminaciones(db: Session, limit: int) -> int:
+    """
+    Borra hasta ``limit`` tombstones más viejos que SYNC_RETENTION (no hace commit);
+    devuelve cuántos.
+    """
+    limite = _db_now(db) - SYNC_RETENTION
+    vencidos = (
+        select(Eliminacion.id)
+        .where(Eliminacion.recurso.in_(RECURSOS), Eliminacion.deleted_at < limite)
+        .limit(limit)
+    )
+    result = db.execute(
+        delete(Eliminacion)
+        .where(Eliminacion.id.in_(vencidos))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _check_desde(desde: datetime, hasta: datetime) -> None:
+    """410 si ``desde`` es anterior a la retención de tombstones."""
+    if desde.tzinfo is None and hasta.tzinfo is not None:
+        desde = desde.replace(tzinfo=hasta.tzinfo)
+    elif desde.tzinfo is not None and hasta.tzinfo is None:
+        # Bases sin zona horaria (SQLite) guardan UTC
+        desde = desde.astimezone(timezone.utc).replace(tzinfo=None)
+    if desde < hasta - SYNC_RETENTION:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=(
+                f"'desde' es anterior a los {SYNC_RETENTION.days} días de historial "
+                "de eliminaciones: sincronice el catálogo completo (sin 'desde')"
+            ),
+        )
+
+
+def _deleted_ids(db: Session, recurso: str, desde: datetime) -> List[int]:
+    stmt = select(Eliminacion.recurso_id).where(
+        Eliminacion.recurso == recurso, Eliminacion.deleted_at >= desde
+    )
+    return list(dict.fromkeys(db.execute(stmt).scalars()))
+
+
+def get_product_changes(db: Session, desde: Optional[datetime]) -> ProductChanges:
+    """
+    Productos creados o actualizados desde ``desde`` y los IDs eliminados.
+    Sin ``desde``, todos los productos (sincronización completa).
+    """
+    hasta = _db_now(db)
+    if desde is None:
+        return ProductChanges(
+            desde=None,
+            hasta=hasta - SYNC_OVERLAP,
+            cambiados=fetch_products(db),
+            eliminados=[],
+        )
+    _check_desde(desde, hasta)
+    cambiados = fetch_products(
+        db, or_(Producto.updated_at >= desde, Producto.created_at >= desde)
+    )
+    return ProductChanges(
+        desde=desde,
+        hasta=hasta - SYNC_OVERLAP,
+        cambiados=cambiados,
+        eliminados=_deleted_ids(db, RECURSO_PRODUCTO, desde),
+    )
+
+
+def get_variant_changes(db: Session, desde: Optional[datetime]) -> VarianteChanges:
+    """
+    Variantes creadas o actualizadas desde ``desde`` y los IDs eliminados.
+    Sin ``desde``, todas las variantes (sincronización completa).
+    """
+    hasta = _db_now(db)
+    if desde is None:
+        return VarianteChanges(
+            desde=None,
+            hasta=hasta - SYNC_OVERLAP,
+            cambiados=fetch_variants(db),
+            eliminados=[],
+        )
+    _check_desde(desde, hasta)
+    cambiados = fetch_variants(
+        db,
+        or_(VarianteProducto.updated_at >= desde, VarianteProducto.created_at >= desde),
+    )
+    return VarianteChanges(
+        desde=desde,
+        hasta=hasta - SYNC_OVERLAP,
+        cambiados=cambiados,
+        eliminados=_deleted_ids(db, RECURSO_VARIANTE, desde),
+    )
@@ -2,26 +2,45 @@
 
 import logging
 import uuid
-from typing import List
+from typing import Dict, List
 from fastapi import HTTPException, status
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from app.models import VarianteProducto
+from app.functions.core_reads import fetch_variants
+from app.admission import admitted
+from app.functions.loader import BatchLoader
+from app.functions.crud_sync import registrar_eliminaciones, RECURSO_VARIANTE
+from app.models import Producto, VarianteProducto
 from app.schemas import VarianteCreate, VarianteOut
+from app.cache.cache_for_category import adjust_category_summary
 from app.cache.cache_for_variants import (
     get_variants_from_cache,
     set_variants_cache,
-    get_variant_from_cache_by_id,
     set_variant_cache_by_id,
+    get_variants_from_cache_by_ids,
+    set_variants_cache_by_id,
+    get_variants_from_cache_by_skus,
+    set_variants_cache_by_sku,
     get_variant_search_cache,
     set_variant_search_cache,
 )
+from app.cache.events import (
+    publish_event,
+    VARIANT_CREATED,
+    VARIANT_UPDATED,
+    VARIANT_DELETED,
+)
+from app.cache.maintenance import after_commit
+from app.cache.snapshot import catalog_snapshot
 from app.cache.cache_utils import (
     invalidate_cache,
     invalidate_pattern,
     DEFAULT_TTL,
+    PRODUCT,
+    PRODUCTS,
     VARIANT,
     VARIANTS,
+    VARIANT_SKU,
 )
 
 logger = logging.getLogger(__name__)
@@ -36,30 +55,79 @@ def list_variants(db: Session) -> List[VarianteOut]:
 
     logger.info("❌ Cache MISS: consultando base de datos")
 
-    orm_list = db.query(VarianteProducto).all()
-    out_list = [VarianteOut.model_validate(c) for c in orm_list]
+    with admitted():
+        out_list = fetch_variants(db)
     set_variants_cache(out_list, ttl=DEFAULT_TTL)
     return out_list
 
 
-def get_variant_by_id(db: Session, variant_id: int) -> VarianteOut:
-    """Devuelve una variante por ID, con cache individual."""
-    variante = get_variant_from_cache_by_id(variant_id)
-    if variante:
-        logger.info("✅ Cache HIT: VARIANTE %s desde Redis", variant_id)
-        return variante
+def load_variants_by_ids(db: Session, variant_ids: List[int]) -> Dict[int, VarianteOut]:
+    """Carga varias variantes: un MGET a Redis y un WHERE id IN (...) para las que falten."""
+    found = get_variants_from_cache_by_ids(variant_ids)
+    if found:
+        logger.info("✅ Cache HIT: %s variantes desde Redis", len(found))
 
-    orm_variant = (
-        db.query(VarianteProducto).filter(VarianteProducto.id == variant_id).first()
-    )
-    if not orm_variant:
+    missing = [variant_id for variant_id in variant_ids if variant_id not in found]
+    if missing:
+        logger.info("❌ Cache MISS: variantes %s en base de datos", missing)
+        loaded = fetch_variants(db, VarianteProducto.id.in_(missing))
+        set_variants_cache_by_id(loaded, ttl=DEFAULT_TTL)
+        found.update({variant.id: variant for variant in loaded})
+    return found
+
+
+variant_loader = BatchLoader(load_variants_by_ids)
+
+
+def get_variant_by_id(db: Session, variant_id: int) -> VarianteOut:
+    """Devuelve una variante por ID, agrupando las búsquedas concurrentes en lotes."""
+    variante = variant_loader.load(db, variant_id)
+    if variante is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Variante Producto {variant_id} no encontrada",
         )
-    out = VarianteOut.model_validate(orm_variant)
-    set_variant_cache_by_id(out, ttl=DEFAULT_TTL)
-    return out
+    return variante
+
+
+def load_variants_by_skus(db: Session, skus: List[str]) -> Dict[str, VarianteOut]:
+    """Carga varias variantes por SKU exacto: un MGET y un WHERE sku IN (...)."""
+    found = get_variants_from_cache_by_skus(skus)
+    if found:
+        logger.info("✅ Cache HIT: %s variantes por SKU desde Redis", len(found))
+
+    missing = [sku for sku in skus if sku not in found]
+    if missing:
+        logger.info("❌ Cache MISS: SKUs %s en base de datos", missing)
+        with admitted():
+            loaded = fetch_variants(db, VarianteProducto.sku.in_(missing))
+        set_variants_cache_by_sku(loaded, ttl=DEFAULT_TTL)
+        found.update({variant.sku: variant for variant in loaded})
+    return found
+
+
+def normalizar_sku(sku: str) -> str:
+    """Normaliza un SKU recibido al formato que genera generar_sku (mayúsculas)."""
+    return sku.strip().upper()
+
+
+def get_variant_by_exact_sku(db: Session, sku: str) -> VarianteOut:
+    """Busca una variante por SKU exacto usando el índice único y la clave sku->variante."""
+    sku = normalizar_sku(sku)
+    variant = load_variants_by_skus(db, [sku]).get(sku)
+    if variant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Variante con SKU {sku} no encontrada",
+        )
+    return variant
+
+
+def get_variants_by_skus(db: Session, skus: List[str]) -> List[VarianteOut]:
+    """Devuelve las variantes de los SKUs pedidos, en el mismo orden (omite las que no existan)."""
+    unique = list(dict.fromkeys(normalizar_sku(sku) for sku in skus))
+    found = load_variants_by_skus(db, unique)
+    return [found[sku] for sku in unique if sku in found]
 
 
 def get_variant_by_sku(
@@ -68,19 +136,20 @@ def get_variant_by_sku(
     """Busca variantes que contengan el SKU, ignorando mayúsculas y ordenando."""
     cached = get_variant_search_cache(search_sku)
 
-    if cached:
+    if cached is not None:
         logger.info("✅ Cache HIT: búsqueda '%s' en Redis", search_sku)
         return cached
 
     logger.info("❌ Cache MISS: búsqueda '%s' en base de datos", search_sku)
 
-    orm_list = (
-        db.query(VarianteProducto)
-        .filter(func.lower(VarianteProducto.sku).like(f"%{search_sku.lower()}%"))
-        .order_by(VarianteProducto.sku.asc())
-        .limit(limit)
-        .all()
-    )
+    with admitted():
+        orm_list = (
+            db.query(VarianteProducto)
+            .filter(func.lower(VarianteProducto.sku).like(f"%{search_sku.lower()}%"))
+            .order_by(VarianteProducto.sku.asc())
+            .limit(limit)
+            .all()
+        )
 
     if not orm_list:
         raise HTTPException(
@@ -98,6 +167,60 @@ def generar_sku(producto_id: int, color: str, talla: str) -> str:
     return f"P{producto_id}-{color[:3].upper()}-{talla[:3].upper()}-{uuid.uuid4().hex[:6].upper()}"
 
 
+def con_stock(stock: int) -> int:
+    """1 si la variante tiene stock disponible, 0 si no."""
+    return 1 if stock > 0 else 0
+
+
+def touch_product(
+    db: Session, producto_id: int, stock_delta: int = 0, con_stock_delta: int = 0
+) -> None:
+    """
+    Marca el producto como actualizado (su respuesta incluye las variantes) y ajusta
+    sus agregados de stock en la misma sentencia UPDATE, sin releer las variantes.
+    """
+    values = {Producto.updated_at: func.now()}
+    if stock_delta:
+        values[Producto.stock_total] = Producto.stock_total + stock_delta
+    if con_stock_delta:
+        values[Producto.variantes_con_stock] = (
+            Producto.variantes_con_stock + con_stock_delta
+        )
+    db.query(Producto).filter(Producto.id == producto_id).update(
+        values, synchronize_session=False
+    )
+
+
+def adjust_summary_stock(db: Session, producto_id: int, stock_delta: int) -> None:
+    """Lleva el cambio de stock de una variante al resumen de la categoría del producto."""
+    if not stock_delta:
+        return
+    producto = db.execute(
+        select(Producto.categoria_id, Producto.activo).where(Producto.id == producto_id)
+    ).first()
+    if producto and producto.activo and producto.categoria_id is not None:
+        adjust_category_summary({producto.categoria_id: (0, stock_delta)})
+
+
+def invalidate_product_cache(producto_id: int) -> None:
+    """Limpia el cache del producto que contiene una variante modificada."""
+    invalidate_cache(resource=PRODUCTS)
+    catalog_snapshot.request_rebuild()
+    invalidate_cache(resource=PRODUCT, resource_id=producto_id)
+    invalidate_pattern(resource=PRODUCTS, pattern_suffix="search:*")
+
+
+def publish_variant_event(tipo: str, variant: VarianteOut) -> None:
+    """Publica el cambio de stock de una variante para los clientes conectados."""
+    publish_event(
+        tipo,
+        id=variant.id,
+        producto_id=variant.producto_id,
+        sku=variant.sku,
+        stock_variante_producto=variant.stock_variante_producto,
+    )
+
+
 def create_variant(db: Session, variant: VarianteCreate) -> VarianteOut:
     """Crear una variante, verificando que no exista duplicado y generando SKU automáticamente."""
 
@@ -126,13 +249,24 @@ def create_variant(db: Session, variant: VarianteCreate) -> VarianteOut:
         sku=sku,
     )
     db.add(new)
+    touch_product(
+        db,
+        variant.producto_id,
+        stock_delta=variant.stock_variante_producto,
+        con_stock_delta=con_stock(variant.stock_variante_producto),
+    )
     db.commit()
     db.refresh(new)
 
-    invalidate_cache(resource=VARIANTS)
-    new_out = VarianteOut.model_validate(new)
-    set_variant_cache_by_id(new_out, ttl=DEFAULT_TTL)
-    invalidate_pattern(resource=VARIANTS, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_product_cache(variant.producto_id)
+        adjust_summary_stock(db, variant.producto_id, variant.stock_variante_producto)
+        invalidate_cache(resource=VARIANTS)
+        new_out = VarianteOut.model_validate(new)
+        set_variant_cache_by_id(new_out, ttl=DEFAULT_TTL)
+        set_variants_cache_by_sku([new_out], ttl=DEFAULT_TTL)
+        invalidate_pattern(resource=VARIANTS, pattern_suffix="search:*")
+        publish_variant_event(VARIANT_CREATED, new_out)
     return new_out
 
 
@@ -142,14 +276,16 @@ def update_variant_by_id(
     """Actualiza una variante existente, validando unicidad y regenerando SKU si es necesario."""
     orm_variant = db.query(VarianteProducto).filter_by(id=variant_id).first()
 
-    producto_id = orm_variant.producto_id
-
     if not orm_variant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Variante con ID {variant_id} no encontrada.",
         )
 
+    producto_id = orm_variant.producto_id
+    old_sku = orm_variant.sku
+    old_stock = orm_variant.stock_variante_producto
+
     duplicate = (
         db.query(VarianteProducto)
         .filter(
@@ -173,15 +309,30 @@ def update_variant_by_id(
     orm_variant.sku = generar_sku(
         producto_id=producto_id, color=variant.color, talla=variant.talla
     )
+    touch_product(
+        db,
+        producto_id,
+        stock_delta=variant.stock_variante_producto - old_stock,
+        con_stock_delta=con_stock(variant.stock_variante_producto)
+        - con_stock(old_stock),
+    )
 
     db.commit()
     db.refresh(orm_variant)
 
-    invalidate_cache(resource=VARIANTS)
-    invalidate_cache(resource=VARIANT, resource_id=variant_id)
-    updated = VarianteOut.model_validate(orm_variant)
-    set_variant_cache_by_id(updated, ttl=DEFAULT_TTL)
-    invalidate_pattern(resource=VARIANTS, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_product_cache(producto_id)
+        adjust_summary_stock(
+            db, producto_id, variant.stock_variante_producto - old_stock
+        )
+        invalidate_cache(resource=VARIANTS)
+        invalidate_cache(resource=VARIANT, resource_id=variant_id)
+        invalidate_cache(resource=VARIANT_SKU, resource_id=old_sku)
+        updated = VarianteOut.model_validate(orm_variant)
+        set_variant_cache_by_id(updated, ttl=DEFAULT_TTL)
+        set_variants_cache_by_sku([updated], ttl=DEFAULT_TTL)
+        invalidate_pattern(resource=VARIANTS, pattern_suffix="search:*")
+        publish_variant_event(VARIANT_UPDATED, updated)
     return updated
 
 
@@ -195,9 +346,21 @@ def delete_variant_by_id(db: Session, variant_id: int) -> None:
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"VARIANTE {variant_id} no encontrada",
         )
+    sku = orm_variant.sku
+    producto_id = orm_variant.producto_id
+    stock = orm_variant.stock_variante_producto
     db.delete(orm_variant)
+    registrar_eliminaciones(db, RECURSO_VARIANTE, [variant_id])
+    touch_product(
+        db, producto_id, stock_delta=-stock, con_stock_delta=-con_stock(stock)
+    )
     db.commit()
 
-    invalidate_cache(resource=VARIANTS)
-    invalidate_cache(resource=VARIANT, resource_id=variant_id)
-    invalidate_pattern(resource=VARIANTS, pattern_suffix="search:*")
+    with after_commit():
+        invalidate_product_cache(producto_id)
+        adjust_summary_stock(db, producto_id, -stock)
+        invalidate_cache(resource=VARIANTS)
+        invalidate_cache(resource=VARIANT, resource_id=variant_id)
+        invalidate_cache(resource=VARIANT_SKU, resource_id=sku)
+        invalidate_pattern(resource=VARIANTS, pattern_suffix="search:*")
+        publish_event(VARIANT_DELETED, id=variant_id, producto_id=producto_id, sku=sku)
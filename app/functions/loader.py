@@ -0,0 +1,107 @@
+"""Agrupación de búsquedas por ID entre solicitudes concurrentes (estilo DataLoader).
+
+Las rutas síncronas corren en el threadpool, así que varias solicitudes pueden pedir
+IDs al mismo tiempo. Si no hay otra carga en curso, el hilo resuelve su ID en el
+acto, sin esperar. Si la hay, abre un lote, espera una ventana corta
+(``BATCH_WINDOW_MS``) a que otros hilos agreguen sus IDs y resuelve todo el lote
+con una sola llamada a ``batch_fn`` (un MGET + un WHERE id IN (...)). Los demás
+hilos solo esperan su resultado. Así la ventana solo se paga con concurrencia,
+que es cuando agrupa.
+
+Si el lote es solo del hilo que lo abrió se usa la sesión de su solicitud; si se
+sumaron otros, una sesión propia y breve (``SessionLocal()``), para que los
+demás no lean dentro de la transacción de otra solicitud ni dependan de ella.
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+
+BATCH_WINDOW = float(os.getenv("BATCH_WINDOW_MS", "2")) / 1000
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100"))
+
+
+class _Batch:
+    """Lote abierto: un Future por clave pedida."""
+
+    def __init__(self):
+        self.futures: Dict[Hashable, Future] = {}
+        self.full = threading.Event()
+        # True cuando otro hilo, además del que abrió el lote, espera resultados
+        self.shared = False
+
+
+class BatchLoader:
+    """Resuelve cargas por clave agrupándolas en lotes."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[Session, List[Hashable]], Dict[Hashable, Any]],
+        window: float = BATCH_WINDOW,
+        max_batch: int = BATCH_MAX_SIZE,
+    ):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._batch: Optional[_Batch] = None
+        self._lock = threading.Lock()
+        # Hilos dentro de load() (esperando un lote o resolviendo el suyo)
+        self._active = 0
+
+    def load(self, db: Session, key: Hashable) -> Optional[Any]:
+        """Devuelve el valor de ``key`` (None si no existe)."""
+        if self.window <= 0:
+            return self.batch_fn(db, [key]).get(key)
+
+        with self._lock:
+            self._active += 1
+            alone = self._active == 1 and self._batch is None
+        try:
+            if alone:
+                return self.batch_fn(db, [key]).get(key)
+            return self._load_batched(db, key)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _load_batched(self, db: Session, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            else:
+                batch.shared = True
+            future = batch.futures.get(key)
+            if future is None:
+                future = batch.futures[key] = Future()
+            if len(batch.futures) >= self.max_batch:
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._dispatch(db, batch)
+
+        return future.result()
+
+    def _dispatch(self, db: Session, batch: _Batch) -> None:
+        keys = list(batch.futures)
+        try:
+            if batch.shared:
+                with SessionLocal() as batch_db:
+                    results = self.batch_fn(batch_db, keys)
+            else:
+                results = self.batch_fn(db, keys)
+        except BaseException as e:  # pylint: disable=broad-except
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+        for key, future in batch.futures.items():
+            future.set_result(results.get(key))
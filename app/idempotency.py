@@ -0,0 +1,225 @@
+"""Encabezado Idempotency-Key para las rutas POST/PUT.
+
+Los reintentos de las herramientas de administración y del ERP repiten la
+solicitud cuando se perdió la respuesta; sin esto volverían a insertar (y
+chocarían con las restricciones únicas). Con ``Idempotency-Key``:
+
+  - La primera solicitud toma un lock en Redis (SET NX), se ejecuta y su
+    respuesta (estado, encabezados y cuerpo) se guarda IDEMPOTENCY_TTL
+    segundos. Las respuestas 5xx no se guardan: el cliente puede reintentar.
+  - Un reintento con la misma clave recibe la respuesta guardada, con
+    ``Idempotent-Replayed: true``, sin pasar por la ruta ni la base de datos.
+  - Si llega mientras la primera sigue en curso: 409.
+  - Si la clave se reutiliza con otro método, ruta o cuerpo: 422.
+
+Las claves se separan por usuario (uid del token de Firebase verificado, no el
+token en sí, que se renueva cada hora), así que un reintento con el token
+renovado recibe la respuesta guardada y un usuario no puede leer la de otro.
+Sin un token válido, o si Redis no está disponible, la solicitud se atiende
+normalmente, sin idempotencia.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.auth.auth import verify_id_token_cached
+from app.cache.admin import redis_connection
+from app.cache.cache_utils import redis_breaker
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Tope del lock por si el worker muere a mitad de la solicitud
+IDEMPOTENCY_LOCK_MS = int(os.getenv("IDEMPOTENCY_LOCK_MS", "30000"))
+IDEMPOTENCY_METHODS = {"POST", "PUT"}
+MAX_KEY_LENGTH = 255
+# Encabezados de la respuesta que no se guardan para la repetición
+_SKIPPED_HEADERS = {b"date", b"server", b"set-cookie", b"content-length"}
+
+
+def _header(scope: Scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _owner(scope: Scope) -> Optional[str]:
+    """uid (o email) del token verificado; None si falta o no es válido."""
+    authorization = _header(scope, b"authorization")
+    if authorization is None or not authorization.startswith(b"Bearer "):
+        return None
+    try:
+        decoded = verify_id_token_cached(authorization[7:].decode("latin-1").strip())
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return decoded.get("uid") or decoded.get("sub") or decoded.get("email")
+
+
+def _fingerprint(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(scope["method"].encode())
+    digest.update(b" " + scope["path"].encode() + b"?" + scope["query_string"])
+    digest.update(b"\n" + body)
+    return digest.hexdigest()
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+
+class IdempotencyMiddleware:
+    """Guarda y repite las respuestas de POST/PUT que traen Idempotency-Key."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENCY_METHODS:
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, b"idempotency-key")
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = raw_key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _error(
+                400, f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres"
+            )(scope, receive, send)
+            return
+
+        # El cuerpo se lee completo para la huella y se vuelve a entregar a la app
+        chunks: List[bytes] = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        # La identidad verificada (no el token, que el cliente renueva cada hora)
+        # separa las claves; sin ella la ruta responde 401 por su cuenta
+        owner = await run_in_threadpool(_owner, scope)
+        if owner is None:
+            await self.app(scope, _replay_body(body, receive), send)
+            return
+        redis_key = (
+            f"idempotency:{hashlib.sha256(owner.encode()).hexdigest()[:16]}:{key}"
+        )
+        fingerprint = _fingerprint(scope, body)
+        stored = await run_in_threadpool(
+            redis_breaker.call, redis_connection.get, redis_key
+        )
+        if stored is not None:
+            await self._replay(stored, fingerprint, scope, receive, send)
+            return
+
+        acquired = await run_in_threadpool(
+            redis_breaker.call,
+            redis_connection.set,
+            f"{redis_key}:lock",
+            fingerprint,
+            nx=True,
+            px=IDEMPOTENCY_LOCK_MS,
+            default="sin_redis",
+        )
+        if acquired == "sin_redis":
+            logger.warning("Idempotencia › Redis no disponible, se atiende sin guardar")
+            await self.app(scope, _replay_body(body, receive), send)
+            return
+        if not acquired:
+            registry.inc("idempotency_total", resultado="en_curso")
+            await _error(
+                409, "Hay una solicitud con la misma Idempotency-Key en curso"
+            )(scope, receive, send)
+            return
+
+        response: dict = {"headers": [], "body": []}
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [k.decode("latin-1"), v.decode("latin-1")]
+                    for k, v in message.get("headers", [])
+                    if k.lower() not in _SKIPPED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, _replay_body(body, receive), capture)
+        finally:
+            await run_in_threadpool(self._store, redis_key, fingerprint, response)
+
+    @staticmethod
+    def _store(redis_key: str, fingerprint: str, response: dict) -> None:
+        """Guarda la respuesta completa (salvo 5xx o si no terminó) y libera el lock."""
+        status_code = response.get("status")
+        pipe = redis_connection.pipeline()
+        if status_code is not None and status_code < 500:
+            record = {
+                "huella": fingerprint,
+                "estado": status_code,
+                "encabezados": response["headers"],
+                "cuerpo": base64.b64encode(b"".join(response["body"])).decode(),
+            }
+            pipe.set(redis_key, json.dumps(record), ex=IDEMPOTENCY_TTL)
+            registry.inc("idempotency_total", resultado="guardada")
+        pipe.delete(f"{redis_key}:lock")
+        redis_breaker.call(pipe.execute)
+
+    async def _replay(
+        self, stored: str, fingerprint: str, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        record = json.loads(stored)
+        if record["huella"] != fingerprint:
+            registry.inc("idempotency_total", resultado="huella_distinta")
+            await _error(
+                422,
+                "Idempotency-Key ya se usó con otra solicitud (método, ruta o cuerpo)",
+            )(scope, receive, send)
+            return
+
+        registry.inc("idempotency_total", resultado="repetida")
+        logger.info("✅ Idempotencia › respuesta repetida desde Redis")
+        body = base64.b64decode(record["cuerpo"])
+        headers = [
+            (k.encode("latin-1"), v.encode("latin-1")) for k, v in record["encabezados"]
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        headers.append((b"idempotent-replayed", b"true"))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": record["estado"],
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """``receive`` que entrega el cuerpo ya leído y después delega en el original."""
+    sent = False
+
+    async def wrapped() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return wrapped
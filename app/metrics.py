@@ -0,0 +1,385 @@
+"""Métricas en proceso con formato de texto de Prometheus (sin dependencias externas).
+
+Contadores e histogramas viven en memoria del worker detrás de un lock. Con
+METRICS_DIR definido, cada worker vuelca periódicamente su estado a
+``metrics-<pid>.json`` y el worker que atiende /metrics suma los archivos de
+todos, de modo que la respuesta es la misma sin importar qué worker la sirva.
+Los gauges solo se suman de los workers vivos; los contadores e histogramas de
+un worker que terminó se acumulan en ``retired.json`` y su archivo se borra,
+así los totales no bajan cuando el PID se recicla.
+"""
+
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso, sin lock entre workers
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+HELP = {
+    "http_request_duration_seconds": "Latencia de las solicitudes por ruta",
+    "cache_requests_total": "Lecturas del cache por espacio y resultado (hit, miss, stale)",
+    "redis_call_duration_seconds": "Latencia de las llamadas a Redis",
+    "cache_invalidate_pattern_duration_seconds": "Duración de invalidate_pattern",
+    "db_pool_checkout_wait_seconds": "Espera para obtener una conexión del pool",
+    "db_pool_in_use": "Conexiones del pool en uso",
+    "db_pool_size": "Tamaño configurado del pool",
+    "redis_breaker_open": "1 si el circuito de Redis está abierto",
+    "cache_maintenance_total": "Operaciones de mantenimiento del cache por resultado",
+    "cache_maintenance_pending": "Operaciones de mantenimiento del cache en cola",
+    "threadpool_in_use": "Hilos del threadpool ocupados por rutas síncronas",
+    "threadpool_size": "Límite de hilos del threadpool",
+    "idempotency_total": "Solicitudes con Idempotency-Key por resultado",
+    "admission_rejected_total": "Solicitudes rechazadas por control de admisión (tasa, concurrencia)",
+}
+
+
+def _labels(**labels: str) -> str:
+    """Serializa las etiquetas como en el formato de texto: a="x",b="y"."""
+    return ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in sorted(labels.items())
+    )
+
+
+class Registry:
+    """Contadores, histogramas y gauges (estos últimos calculados al exportar)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, float]] = {}
+        # nombre -> etiquetas -> [conteo por bucket..., +Inf, suma]
+        self.histograms: Dict[str, Dict[str, List[float]]] = {}
+        self.gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Suma ``value`` al contador."""
+        key = _labels(**labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Registra una observación en el histograma."""
+        key = _labels(**labels)
+        index = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0.0] * (len(BUCKETS) + 2)
+            values[index] += 1
+            values[-1] += seconds
+
+    def gauge(self, name: str, func: Callable[[], Dict[str, float]]) -> None:
+        """Registra un gauge: ``func`` devuelve {etiquetas serializadas: valor}."""
+        self.gauges[name] = func
+
+    def snapshot(self) -> dict:
+        """Estado actual serializable (para el archivo por PID)."""
+        gauges = {}
+        for name, func in self.gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception:  # pylint: disable=broad-except
+                logger.warning("No se pudo leer el gauge %s", name)
+        with self._lock:
+            return {
+                "counters": {n: dict(s) for n, s in self.counters.items()},
+                "histograms": {
+                    n: {k: list(v) for k, v in s.items()}
+                    for n, s in self.histograms.items()
+                },
+                "gauges": gauges,
+            }
+
+
+registry = Registry()
+
+
+# -----------------------------
+# AGREGACIÓN ENTRE WORKERS
+# -----------------------------
+
+# Acumulado de los workers que ya terminaron (no coincide con metrics-*.json)
+RETIRED_FILE = "retired.json"
+
+
+def _metrics_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def _pid_files() -> Dict[int, str]:
+    files = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            files[int(os.path.basename(path)[len("metrics-") : -len(".json")])] = path
+        except ValueError:
+            continue
+    return files
+
+
+def _read(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path: str, data: dict) -> None:
+    """Reemplazo atómico: quien lee nunca ve un archivo a medias."""
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _dir_lock() -> Iterator[None]:
+    """Lock entre procesos sobre METRICS_DIR (retirar y sumar no se pisan)."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(METRICS_DIR, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge(merged: dict, data: dict, gauges: bool = True) -> None:
+    kinds = ("counters", "gauges") if gauges else ("counters",)
+    for kind in kinds:
+        for name, series in data.get(kind, {}).items():
+            target = merged.setdefault(kind, {}).setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+    for name, series in data.get("histograms", {}).items():
+        target = merged.setdefault("histograms", {}).setdefault(name, {})
+        for key, values in series.items():
+            current = target.get(key)
+            target[key] = (
+                [a + b for a, b in zip(current, values)] if current else list(values)
+            )
+
+
+def flush() -> None:
+    """Escribe el estado de este worker en METRICS_DIR (reemplazo atómico)."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write(_metrics_path(os.getpid()), registry.snapshot())
+
+
+def clear() -> None:
+    """Borra los archivos de una ejecución anterior (al arrancar el servidor, antes de los workers)."""
+    if not METRICS_DIR:
+        return
+    paths = glob.glob(os.path.join(METRICS_DIR, "metrics-*.json"))
+    for path in [*paths, os.path.join(METRICS_DIR, RETIRED_FILE)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("No se pudo borrar %s", path)
+
+
+def _retire(include_own: bool = False) -> None:
+    """
+    Suma los archivos de PIDs muertos a RETIRED_FILE y los borra (requiere _dir_lock).
+    Así un PID reciclado no pisa contadores ajenos y los totales nunca bajan.
+    Con ``include_own`` también retira el archivo con el PID propio: al arrancar
+    un worker, ese archivo es de un proceso anterior que tuvo el mismo PID.
+    """
+    own = os.getpid()
+    dead = {
+        pid: path
+        for pid, path in _pid_files().items()
+        if (include_own and pid == own) or (pid != own and not _alive(pid))
+    }
+    if not dead:
+        return
+    retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+    retired = _read(retired_path) or {}
+    for path in dead.values():
+        data = _read(path)
+        if data is not None:
+            _merge(retired, data, gauges=False)
+    _write(retired_path, retired)
+    for path in dead.values():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    logger.info("Métricas › %s archivos de workers terminados acumulados", len(dead))
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except OSError:
+            logger.warning("No se pudieron guardar las métricas en %s", METRICS_DIR)
+
+
+def start_flusher() -> None:
+    """Inicia el volcado periódico si hay METRICS_DIR (uno por worker)."""
+    if not METRICS_DIR:
+        return
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with _dir_lock():
+            _retire(include_own=True)
+    except OSError:
+        logger.warning("No se pudieron acumular las métricas en %s", METRICS_DIR)
+    threading.Thread(target=_flush_loop, name="metrics", daemon=True).start()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect() -> dict:
+    """Suma el estado de todos los workers (o solo el local sin METRICS_DIR)."""
+    if not METRICS_DIR:
+        return registry.snapshot()
+    flush()
+    merged: dict = {"counters": {}, "histograms": {}, "gauges": {}}
+    with _dir_lock():
+        _retire()
+        _merge(merged, _read(os.path.join(METRICS_DIR, RETIRED_FILE)) or {})
+        for path in _pid_files().values():
+            data = _read(path)
+            if data is not None:
+                _merge(merged, data)
+    return merged
+
+
+def _series(name: str, key: str) -> str:
+    return f"{name}{{{key}}}" if key else name
+
+
+def render() -> str:
+    """Exporta las métricas en el formato de texto de Prometheus."""
+    data = collect()
+    lines: List[str] = []
+
+    def header(name: str, kind: str) -> None:
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for name, series in sorted(data["counters"].items()):
+        header(name, "counter")
+        lines.extend(f"{_series(name, key)} {value:g}" for key, value in series.items())
+    for name, series in sorted(data["gauges"].items()):
+        header(name, "gauge")
+        lines.extend(f"{_series(name, key)} {value:g}" for key, value in series.items())
+    for name, series in sorted(data["histograms"].items()):
+        header(name, "histogram")
+        for key, values in series.items():
+            sep = "," if key else ""
+            cumulative = 0.0
+            for bound, count in zip([*BUCKETS, "+Inf"], values[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{key}{sep}le="{bound}"}} {cumulative:g}')
+            lines.append(f"{_series(name + '_sum', key)} {values[-1]:.6f}")
+            lines.append(f"{_series(name + '_count', key)} {cumulative:g}")
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# PUNTOS DE MEDICIÓN
+# -----------------------------
+
+
+def cache_result(namespace: str, resultado: str) -> None:
+    """Cuenta una lectura del cache: hit, miss o stale (payload que ya no valida)."""
+    registry.inc("cache_requests_total", namespace=namespace, resultado=resultado)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout (incluye abrir conexiones nuevas)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            registry.observe(
+                "db_pool_checkout_wait_seconds", time.perf_counter() - start
+            )
+
+
+def register_pool_gauges(engine) -> None:
+    """Gauges de conexiones en uso y tamaño del pool del engine."""
+    # engine.pool se lee en cada exportación: dispose() (p. ej. tras el fork) lo reemplaza
+    if hasattr(engine.pool, "checkedout"):
+        registry.gauge("db_pool_in_use", lambda: {"": engine.pool.checkedout()})
+    if hasattr(engine.pool, "size"):
+        registry.gauge("db_pool_size", lambda: {"": engine.pool.size()})
+
+
+class MetricsMiddleware:
+    """Histograma de latencia por ruta (plantilla de la ruta, no la URL concreta)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            registry.observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - start,
+                metodo=scope["method"],
+                ruta=getattr(route, "path", "sin_ruta"),
+                status=str(status),
+            )
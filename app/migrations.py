@@ -0,0 +1,128 @@
+"""Paso explícito de migración: crea las tablas, columnas e índices que aún no existen.
+
+Uso (paso de la publicación, una vez por despliegue y antes de arrancar las
+réplicas nuevas):
+    python -m app.migrations
+
+El servidor no migra por su cuenta: varias réplicas ejecutarían los mismos
+ALTER/CREATE INDEX a la vez y una base caída impediría arrancar. Para
+desarrollo, MIGRATE_ON_START=true (``python -m app.server``) o
+AUTO_MIGRATE=true (``uvicorn main:app``).
+"""
+
+import logging
+from typing import Any, Dict, List
+from sqlalchemy import Column, func, inspect, select, text, update
+from sqlalchemy.engine import Dialect, Engine
+from sqlalchemy.schema import CreateColumn
+from app.database import engine
+from app.models import Base, Producto, VarianteProducto
+
+logger = logging.getLogger(__name__)
+
+
+def create_missing_tables(bind: Engine = engine) -> List[str]:
+    """Crea las tablas del modelo que no existan y devuelve sus nombres."""
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    created = []
+    for name, table in Base.metadata.tables.items():
+        if name in tables:
+            logger.info("Ya existe... se Omite : %s", name)
+        else:
+            logger.info("Creando tabla: %s", name)
+            table.create(bind=bind)
+            created.append(name)
+    return created
+
+
+def add_column_ddl(column: Column, dialect: Dialect) -> str:
+    """ALTER TABLE que agrega ``column`` en el dialecto dado (SQL Server usa ADD, no ADD COLUMN)."""
+    table = dialect.identifier_preparer.format_table(column.table)
+    definition = CreateColumn(column).compile(dialect=dialect)
+    keyword = "ADD" if dialect.name == "mssql" else "ADD COLUMN"
+    return f"ALTER TABLE {table} {keyword} {definition}"
+
+
+def add_missing_columns(bind: Engine = engine) -> List[str]:
+    """Agrega con ALTER TABLE las columnas del modelo que falten en tablas existentes."""
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    added = []
+    with bind.begin() as conn:
+        for name, table in Base.metadata.tables.items():
+            if name not in tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                logger.info("Agregando columna: %s.%s", name, column.name)
+                conn.execute(text(add_column_ddl(column, bind.dialect)))
+                added.append(f"{name}.{column.name}")
+    return added
+
+
+def product_aggregate_values() -> Dict[str, Any]:
+    """Valores de UPDATE que recalculan los agregados de Producto desde sus variantes."""
+    stock_total = (
+        select(func.coalesce(func.sum(VarianteProducto.stock_variante_producto), 0))
+        .where(VarianteProducto.producto_id == Producto.id)
+        .scalar_subquery()
+    )
+    variantes_con_stock = (
+        select(func.count())
+        .where(
+            VarianteProducto.producto_id == Producto.id,
+            VarianteProducto.stock_variante_producto > 0,
+        )
+        .scalar_subquery()
+    )
+    return {
+        "stock_total": stock_total,
+        "variantes_con_stock": variantes_con_stock,
+        "precio_efectivo": func.coalesce(
+            Producto.precio_oferta_producto, Producto.precio_producto
+        ),
+    }
+
+
+def backfill_product_aggregates(bind: Engine = engine) -> None:
+    """Recalcula stock_total, variantes_con_stock y precio_efectivo de todos los productos."""
+    with bind.begin() as conn:
+        result = conn.execute(update(Producto).values(**product_aggregate_values()))
+    logger.info("Agregados recalculados para %s productos", result.rowcount)
+
+
+def create_missing_indexes(bind: Engine = engine) -> List[str]:
+    """Crea los índices del modelo que falten en tablas ya existentes."""
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    created = []
+    for name, table in Base.metadata.tables.items():
+        if name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info("Creando índice: %s", index.name)
+                index.create(bind=bind)
+                created.append(index.name)
+    return created
+
+
+def migrate(bind: Engine = engine) -> None:
+    """Ejecuta todos los pasos de migración."""
+    create_missing_tables(bind)
+    added = add_missing_columns(bind)
+    create_missing_indexes(bind)
+    if any(column.startswith(f"{Producto.__tablename__}.") for column in added):
+        backfill_product_aggregates(bind)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
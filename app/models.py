@@ -11,6 +11,7 @@ from sqlalchemy import (
     ForeignKey,
     Boolean,
     UniqueConstraint,
+    Index,
     func,
 )
 from sqlalchemy.orm import declarative_base, relationship
@@ -28,7 +29,10 @@ class Categoria(Base):
     logo_categoria = Column(String(255), nullable=False)
 
     productos = relationship(
-        "Producto", back_populates="categoria", cascade="all, delete"
+        "Producto",
+        back_populates="categoria",
+        cascade="all, delete",
+        passive_deletes=True,
     )
 
 
@@ -45,14 +49,31 @@ class Producto(Base):
     imagen_url_producto = Column(String(255), nullable=False)
     activo = Column(Boolean, default=True)
 
-    categoria_id = Column(Integer, ForeignKey("categorias.id"), index=True)
+    # Agregados de las variantes, mantenidos por crud_variants al crear/editar/borrar
+    stock_total = Column(Integer, nullable=False, default=0, server_default="0")
+    variantes_con_stock = Column(
+        Integer, nullable=False, default=0, server_default="0", index=True
+    )
+    precio_efectivo = Column(Float, nullable=True, index=True)
+
+    categoria_id = Column(
+        Integer, ForeignKey("categorias.id", ondelete="CASCADE"), index=True
+    )
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
 
     categoria = relationship("Categoria", back_populates="productos")
     variantes = relationship(
-        "VarianteProducto", back_populates="producto", cascade="all, delete-orphan"
+        "VarianteProducto",
+        back_populates="producto",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
 
@@ -71,11 +92,33 @@ class VarianteProducto(Base):
         Integer, ForeignKey("productos.id", ondelete="CASCADE"), index=True
     )
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
 
     producto = relationship("Producto", back_populates="variantes")
 
     __table_args__ = (
         UniqueConstraint("producto_id", "color", "talla", name="uq_variante_producto"),
     )
+
+
+class Eliminacion(Base):
+    """Registro (tombstone) de un producto o variante eliminado, para la sincronización incremental"""
+
+    __tablename__ = "eliminaciones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    recurso = Column(String(20), nullable=False)
+    recurso_id = Column(Integer, nullable=False)
+    deleted_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_eliminaciones_recurso_deleted_at", "recurso", "deleted_at"),
+    )
@@ -0,0 +1,166 @@
+"""Conteo de consultas por solicitud, presupuesto por ruta y log de consultas lentas.
+
+Los eventos before/after_cursor_execute del engine miden cada sentencia:
+
+  - la suman al acumulador de la solicitud actual (``QueryStats``, abierto por
+    ``QueryBudgetMiddleware``) y a la categoría ``db`` de Server-Timing;
+  - si supera SLOW_QUERY_MS la registran en el log, con los parámetros
+    ocultos (solo se indica cuántos hay).
+
+Una ruta declara su presupuesto con ``dependencies=[Depends(query_budget(n))]``.
+Al excederlo se registra una advertencia; con QUERY_BUDGET_STRICT=true la
+sentencia que lo excede lanza ``QueryBudgetExceeded`` (útil en pruebas para
+detectar N+1, p. ej. cargas perezosas de variantes o categoría).
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.timing import record
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+# Sentencias que se guardan por solicitud para el mensaje de presupuesto excedido
+MAX_TRACKED_STATEMENTS = 50
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """La solicitud ejecutó más consultas que el presupuesto de su ruta."""
+
+
+class QueryStats:
+    """Consultas y tiempo en base de datos de una solicitud."""
+
+    __slots__ = ("count", "seconds", "budget", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.budget: Optional[int] = None
+        self.statements: List[str] = []
+
+    def over_budget(self) -> bool:
+        """True si la ruta declaró un presupuesto y ya lo superó."""
+        return self.budget is not None and self.count > self.budget
+
+
+_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_listeners: List[Callable[[str, QueryStats], None]] = []
+
+
+def _short(statement: str, limit: int = 500) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "…"
+
+
+def _redacted(parameters) -> str:
+    if not parameters:
+        return "sin parámetros"
+    if (
+        isinstance(parameters, (list, tuple))
+        and parameters
+        and isinstance(parameters[0], (list, tuple, dict))
+    ):
+        return f"{len(parameters)} filas de parámetros ocultas"
+    return f"{len(parameters)} parámetros ocultos"
+
+
+def install_query_log(engine: Engine) -> None:
+    """Instala la medición por sentencia en ``engine``."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, _cursor, statement, _parameters, _context, _executemany):
+        stats = _stats.get()
+        if stats is not None:
+            stats.count += 1
+            if len(stats.statements) < MAX_TRACKED_STATEMENTS:
+                stats.statements.append(_short(statement, 200))
+            if QUERY_BUDGET_STRICT and stats.over_budget():
+                raise QueryBudgetExceeded(
+                    f"{stats.count} consultas (presupuesto {stats.budget}): "
+                    f"{_short(statement, 200)}"
+                )
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, _cursor, statement, parameters, _context, _executemany):
+        stack = conn.info.get("query_start")
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        record("db", elapsed)
+        stats = _stats.get()
+        if stats is not None:
+            stats.seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            logger.warning(
+                "🐢 Consulta lenta (%.0f ms, %s): %s",
+                elapsed * 1000,
+                _redacted(parameters),
+                _short(statement),
+            )
+
+
+def query_budget(max_queries: int) -> Callable[[], None]:
+    """Dependencia que declara cuántas consultas puede ejecutar la ruta."""
+
+    def declare_budget() -> None:
+        stats = _stats.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    declare_budget.budget = max_queries
+    return declare_budget
+
+
+@contextmanager
+def capture_queries() -> Iterator[List[QueryStats]]:
+    """Junta las estadísticas de cada solicitud terminada dentro del bloque."""
+    captured: List[QueryStats] = []
+
+    def listener(_path: str, stats: QueryStats) -> None:
+        captured.append(stats)
+
+    _listeners.append(listener)
+    try:
+        yield captured
+    finally:
+        _listeners.remove(listener)
+
+
+class QueryBudgetMiddleware:
+    """Abre el acumulador de consultas por solicitud y resume la solicitud al terminar."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _stats.reset(token)
+            if stats.over_budget():
+                logger.warning(
+                    "Presupuesto de consultas excedido: %s %s ejecutó %d consultas "
+                    "(presupuesto %d)",
+                    scope["method"],
+                    scope["path"],
+                    stats.count,
+                    stats.budget,
+                )
+            for listener in list(_listeners):
+                listener(scope["path"], stats)
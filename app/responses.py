@@ -0,0 +1,71 @@
+"""Respuestas JSON que serializan una sola vez con el serializador de Pydantic."""
+
+from typing import Any, Mapping, Optional
+from fastapi.responses import JSONResponse, Response
+from pydantic_core import to_json
+from app.cache.cache_utils import get_encoded_cache, make_etag
+from app.cache.snapshot import SnapshotFile
+from app.metrics import cache_result
+from app.timing import timed
+
+
+class PydanticJSONResponse(JSONResponse):
+    """
+    Respuesta para modelos ya validados (o dicts del cache).
+    Al devolver una Response, FastAPI no vuelve a validar contra response_model;
+    el cuerpo se genera directamente en bytes con pydantic_core (Rust).
+    Las respuestas 200 llevan un ETag calculado del cuerpo renderizado.
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        **kwargs,
+    ):
+        super().__init__(content, status_code, headers, **kwargs)
+        if status_code == 200:
+            self.headers.setdefault("etag", make_etag(self.body))
+
+    def render(self, content: Any) -> bytes:
+        with timed("serializacion"):
+            return to_json(content)
+
+
+def encoded_response(body: bytes, etag: str, encoding: Optional[str]) -> Response:
+    """
+    Respuesta con un JSON ya serializado (y quizá ya comprimido).
+    La versión comprimida usa el ETag de la entrada como ETag débil.
+    """
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = f"W/{etag}"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_encoded_response(
+    key: str, encoding: Optional[str], namespace: str
+) -> Optional[Response]:
+    """
+    Sirve la versión precomprimida guardada en el cache para ``key``, si existe.
+    Solo cuenta los hits: en un miss la ruta sigue con el JSON del cache, que cuenta el suyo.
+    """
+    if not encoding:
+        return None
+    cached = get_encoded_cache(key, encoding)
+    if cached is None:
+        return None
+    cache_result(namespace, "hit")
+    body, etag = cached
+    return encoded_response(body, etag, encoding)
+
+
+def snapshot_response(
+    snapshot: SnapshotFile, encoding: Optional[str] = None
+) -> Response:
+    """Respuesta con el JSON de un snapshot mapeado en memoria (comprimido si se puede)."""
+    if encoding in snapshot.encoded:
+        return encoded_response(snapshot.encoded[encoding][:], snapshot.etag, encoding)
+    return encoded_response(snapshot.body[:], snapshot.etag, None)
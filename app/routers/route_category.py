@@ -1,13 +1,21 @@
 """Rutas para manejar las operaciones CRUD de categorías."""
 
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from app.auth.security import is_admin
 from app.database import SessionLocal
-from app.schemas import CategoryCreate, CategoryOut
+from app.responses import PydanticJSONResponse, snapshot_response
+from app.cache.compression import choose_encoding
+from app.cache.cache_utils import make_key, CATEGORIES, CATEGORY
+from app.querylog import query_budget
+from app.admission import list_admission, search_admission
+from app.conditional import cached_not_modified
+from app.cache.snapshot import catalog_snapshot
+from app.schemas import CategoryCreate, CategoryOut, CategorySummary
 from app.functions.crud_category import (
     list_categories,
+    get_category_summary,
     get_category_by_id,
     create_category,
     get_category_by_name,
@@ -28,22 +36,60 @@ def get_db():
         db.close()
 
 
-@router.get("/", response_model=List[CategoryOut], tags=["Categories"])
-def read_all_categories(db: Session = Depends(get_db)):
+@router.get(
+    "/",
+    response_model=List[CategoryOut],
+    tags=["Categories"],
+    dependencies=[Depends(list_admission), Depends(query_budget(1))],
+)
+def read_all_categories(request: Request, db: Session = Depends(get_db)):
     """Listar todas las categorías."""
-    return list_categories(db)
-
-
-@router.get("/{category_id}", response_model=CategoryOut, tags=["Categories"])
-def read_category_detail(category_id: int, db: Session = Depends(get_db)):
-    """Obtener detalles de una categoría específica."""
-    return get_category_by_id(db, category_id)
+    cached = cached_not_modified(request, make_key(CATEGORIES))
+    if cached is not None:
+        return cached
+    snapshot = catalog_snapshot.get(CATEGORIES)
+    if snapshot is not None:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        return snapshot_response(snapshot, encoding)
+    return PydanticJSONResponse(list_categories(db))
+
+
+@router.get(
+    "/summary",
+    response_model=List[CategorySummary],
+    tags=["Categories"],
+    dependencies=[Depends(query_budget(2))],
+)
+def read_category_summary(db: Session = Depends(get_db)):
+    """Listar categorías con su cantidad de productos activos y stock total (menús)."""
+    return PydanticJSONResponse(get_category_summary(db))
 
 
-@router.get("/search", response_model=List[CategoryOut], tags=["Categories"])
+@router.get(
+    "/search",
+    response_model=List[CategoryOut],
+    tags=["Categories"],
+    dependencies=[Depends(search_admission), Depends(query_budget(1))],
+)
 def search_categories(nombre: str, db: Session = Depends(get_db)):
     """Buscar categorías por coincidencia parcial en el nombre."""
-    return get_category_by_name(db, nombre)
+    return PydanticJSONResponse(get_category_by_name(db, nombre))
+
+
+@router.get(
+    "/{category_id}",
+    response_model=CategoryOut,
+    tags=["Categories"],
+    dependencies=[Depends(query_budget(1))],
+)
+def read_category_detail(
+    request: Request, category_id: int, db: Session = Depends(get_db)
+):
+    """Obtener detalles de una categoría específica."""
+    cached = cached_not_modified(request, make_key(CATEGORY, category_id))
+    if cached is not None:
+        return cached
+    return PydanticJSONResponse(get_category_by_id(db, category_id))
 
 
 @router.post("/", response_model=CategoryOut, status_code=201, tags=["Categories"])
@@ -51,7 +97,7 @@ def create_new_category(
     cat_in: CategoryCreate, db: Session = Depends(get_db), _: dict = Depends(is_admin)
 ):
     """Crear una nueva categoría."""
-    return create_category(db, cat_in)
+    return PydanticJSONResponse(create_category(db, cat_in), status_code=201)
 
 
 @router.put("/{category_id}", response_model=CategoryOut, tags=["Categories"])
@@ -62,7 +108,7 @@ def update_existing_category(
     _: dict = Depends(is_admin),
 ):
     """Actualizar una categoría existente."""
-    return update_category_by_id(db, category_id, cat_in)
+    return PydanticJSONResponse(update_category_by_id(db, category_id, cat_in))
 
 
 @router.delete("/{category_id}", status_code=204, tags=["Categories"])
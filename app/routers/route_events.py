@@ -0,0 +1,37 @@
+"""Rutas para recibir los cambios de stock y precio en tiempo real (SSE)."""
+
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from app.cache.events import event_hub
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = 15
+
+
+@router.get("/stream", tags=["Events"])
+async def stream_events(request: Request, productos: Optional[List[int]] = Query(None)):
+    """Stream SSE de cambios de productos y variantes; se puede filtrar por productos."""
+    filtro = set(productos or [])
+
+    async def event_stream():
+        async with event_hub.subscribe() as queue:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if filtro and json.loads(data).get("producto_id") not in filtro:
+                    continue
+                yield f"data: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
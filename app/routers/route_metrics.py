@@ -0,0 +1,15 @@
+"""Ruta con las métricas en formato de texto de Prometheus."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.metrics import render
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """Latencias por ruta, cache, Redis y pool de la base de datos (todos los workers)."""
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
@@ -1,14 +1,29 @@
 """Rutas para manejar las operaciones CRUD de PRODUCTOS."""
 
-from typing import List
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from app.auth.security import is_admin
 from app.database import SessionLocal
-from app.schemas import ProductCreate, ProductOut
+from app.responses import (
+    PydanticJSONResponse,
+    cached_encoded_response,
+    snapshot_response,
+)
+from app.cache.compression import choose_encoding
+from app.cache.cache_utils import make_key, PRODUCT, PRODUCTS
+from app.querylog import query_budget
+from app.admission import list_admission, search_admission
+from app.conditional import cached_not_modified
+from app.cache.snapshot import catalog_snapshot
+from app.functions.crud_sync import get_product_changes
+from app.schemas import ProductChanges, ProductCreate, ProductOut
 from app.functions.crud_products import (
     list_products,
+    list_filtered_products,
     get_prodct,
+    get_products_by_ids,
     create_product,
     get_product_by_name,
     update_product_by_id,
@@ -18,6 +33,8 @@ from app.functions.crud_products import (
 
 router = APIRouter()
 
+MAX_BATCH_IDS = 100
+
 
 def get_db():
     """Genera una sesión de base de datos por solicitud."""
@@ -28,22 +45,93 @@ def get_db():
         db.close()
 
 
-@router.get("/", response_model=List[ProductOut], tags=["Products"])
-def read_all_products(db: Session = Depends(get_db)):
-    """Listar todos los PRODUCTOS"""
-    return list_products(db)
-
-
-@router.get("/search", response_model=List[ProductOut], tags=["Products"])
+@router.get(
+    "/",
+    response_model=List[ProductOut],
+    tags=["Products"],
+    dependencies=[Depends(list_admission), Depends(query_budget(2))],
+)
+def read_all_products(
+    request: Request,
+    en_stock: Optional[bool] = None,
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Listar todos los PRODUCTOS, opcionalmente filtrados por stock y precio efectivo"""
+    if en_stock is None and precio_min is None and precio_max is None:
+        cached = cached_not_modified(request, make_key(PRODUCTS))
+        if cached is not None:
+            return cached
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        snapshot = catalog_snapshot.get(PRODUCTS)
+        if snapshot is not None:
+            return snapshot_response(snapshot, encoding)
+        compressed = cached_encoded_response(make_key(PRODUCTS), encoding, PRODUCT)
+        if compressed is not None:
+            return compressed
+        return PydanticJSONResponse(list_products(db))
+    return PydanticJSONResponse(
+        list_filtered_products(db, en_stock, precio_min, precio_max)
+    )
+
+
+@router.get(
+    "/search",
+    response_model=List[ProductOut],
+    tags=["Products"],
+    dependencies=[Depends(search_admission), Depends(query_budget(3))],
+)
 def search_products(nombre: str, db: Session = Depends(get_db)):
     """Buscar producto por coincidencia parcial en el nombre."""
-    return get_product_by_name(db, nombre)
+    return PydanticJSONResponse(get_product_by_name(db, nombre))
 
 
-@router.get("/{product_id}", response_model=ProductOut, tags=["Products"])
-def read_product_detail(product_id: int, db: Session = Depends(get_db)):
+@router.get(
+    "/batch",
+    response_model=List[ProductOut],
+    tags=["Products"],
+    dependencies=[Depends(query_budget(2))],
+)
+def read_products_batch(
+    ids: List[int] = Query(..., max_length=MAX_BATCH_IDS),
+    db: Session = Depends(get_db),
+):
+    """Obtener varios productos por ID (carrito, favoritos) en el orden pedido."""
+    return PydanticJSONResponse(get_products_by_ids(db, ids))
+
+
+@router.get(
+    "/changes",
+    response_model=ProductChanges,
+    tags=["Products"],
+    dependencies=[Depends(query_budget(4))],
+)
+def read_product_changes(
+    desde: Optional[datetime] = None, db: Session = Depends(get_db)
+):
+    """
+    Cambios desde una fecha; el cliente envía el 'hasta' recibido como próximo 'desde'.
+    Sin 'desde' devuelve todo (sincronización completa); 410 si 'desde' es más
+    viejo que SYNC_RETENTION_DAYS y hay que volver a sincronizar completo.
+    """
+    return PydanticJSONResponse(get_product_changes(db, desde))
+
+
+@router.get(
+    "/{product_id}",
+    response_model=ProductOut,
+    tags=["Products"],
+    dependencies=[Depends(query_budget(2))],
+)
+def read_product_detail(
+    request: Request, product_id: int, db: Session = Depends(get_db)
+):
     """Obtener los detalles de un producto específico."""
-    return get_prodct(db, product_id)
+    cached = cached_not_modified(request, make_key(PRODUCT, product_id))
+    if cached is not None:
+        return cached
+    return PydanticJSONResponse(get_prodct(db, product_id))
 
 
 @router.post("/", response_model=ProductOut, status_code=201, tags=["Products"])
@@ -53,7 +141,7 @@ def create_new_product(
     _: dict = Depends(is_admin),
 ):
     """Crear un nuevo producto."""
-    return create_product(db, product_in)
+    return PydanticJSONResponse(create_product(db, product_in), status_code=201)
 
 
 @router.put("/{product_id}", response_model=ProductOut, tags=["Products"])
@@ -64,7 +152,7 @@ def update_existing_product(
     _: dict = Depends(is_admin),
 ):
     """Actualizar un producto existente."""
-    return update_product_by_id(db, product_id, product_in)
+    return PydanticJSONResponse(update_product_by_id(db, product_id, product_in))
 
 
 @router.delete("/{product_id}", status_code=204, tags=["Products"])
@@ -1,23 +1,35 @@
 """Rutas para manejar las operaciones CRUD de variantes."""
 
-from typing import List
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from app.auth.security import is_admin
 from app.database import SessionLocal
-
-from app.schemas import VarianteCreate, VarianteOut
+from app.responses import PydanticJSONResponse, cached_encoded_response
+from app.cache.compression import choose_encoding
+from app.cache.cache_utils import make_key, VARIANT, VARIANTS
+from app.querylog import query_budget
+from app.admission import list_admission, search_admission
+from app.conditional import cached_not_modified
+
+from app.functions.crud_sync import get_variant_changes
+from app.schemas import VarianteChanges, VarianteCreate, VarianteOut
 from app.functions.crud_variants import (
     list_variants,
     get_variant_by_id,
     create_variant,
     get_variant_by_sku,
+    get_variant_by_exact_sku,
+    get_variants_by_skus,
     update_variant_by_id,
     delete_variant_by_id,
 )
 
 router = APIRouter()
 
+MAX_BATCH_SKUS = 100
+
 
 def get_db():
     """Genera una sesión de base de datos por solicitud."""
@@ -28,22 +40,84 @@ def get_db():
         db.close()
 
 
-@router.get("/", response_model=List[VarianteOut], tags=["Variantes"])
-def read_all_variants(db: Session = Depends(get_db)):
+@router.get(
+    "/",
+    response_model=List[VarianteOut],
+    tags=["Variantes"],
+    dependencies=[Depends(list_admission), Depends(query_budget(1))],
+)
+def read_all_variants(request: Request, db: Session = Depends(get_db)):
     """Listar todas las variantes."""
-    return list_variants(db)
+    cached = cached_not_modified(request, make_key(VARIANTS))
+    if cached is not None:
+        return cached
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    compressed = cached_encoded_response(make_key(VARIANTS), encoding, VARIANT)
+    if compressed is not None:
+        return compressed
+    return PydanticJSONResponse(list_variants(db))
+
+
+@router.get(
+    "/search",
+    response_model=VarianteOut,
+    tags=["Variantes"],
+    dependencies=[Depends(query_budget(1))],
+)
+def read_variant_id_detail(
+    request: Request, variant_id: int, db: Session = Depends(get_db)
+):
+    """Buscar variante por ID."""
+    cached = cached_not_modified(request, make_key(VARIANT, variant_id))
+    if cached is not None:
+        return cached
+    return PydanticJSONResponse(get_variant_by_id(db, variant_id))
 
 
-@router.get("/search", response_model=List[VarianteOut], tags=["Variantes"])
-def read_variant_id_detail(variant_id: int, db: Session = Depends(get_db)):
-    """Buscar variante por ID."""
-    return get_variant_by_id(db, variant_id)
+@router.get(
+    "/batch",
+    response_model=List[VarianteOut],
+    tags=["Variantes"],
+    dependencies=[Depends(query_budget(1))],
+)
+def read_variants_batch(
+    skus: List[str] = Query(..., max_length=MAX_BATCH_SKUS),
+    db: Session = Depends(get_db),
+):
+    """Obtener varias variantes por SKU exacto en el orden pedido."""
+    return PydanticJSONResponse(get_variants_by_skus(db, skus))
 
 
-@router.get("/{variant_sku}", response_model=List[VarianteOut], tags=["Variantes"])
-def read_variant_sku_detail(variant_sku: str, db: Session = Depends(get_db)):
-    """Obtener detalles de una variante específica."""
-    return get_variant_by_sku(db, variant_sku)
+@router.get(
+    "/changes",
+    response_model=VarianteChanges,
+    tags=["Variantes"],
+    dependencies=[Depends(query_budget(3))],
+)
+def read_variant_changes(
+    desde: Optional[datetime] = None, db: Session = Depends(get_db)
+):
+    """
+    Cambios desde una fecha; el cliente envía el 'hasta' recibido como próximo 'desde'.
+    Sin 'desde' devuelve todo (sincronización completa); 410 si 'desde' es más
+    viejo que SYNC_RETENTION_DAYS y hay que volver a sincronizar completo.
+    """
+    return PydanticJSONResponse(get_variant_changes(db, desde))
+
+
+@router.get(
+    "/{variant_sku}",
+    response_model=List[VarianteOut],
+    tags=["Variantes"],
+    dependencies=[Depends(search_admission), Depends(query_budget(1))],
+)
+def read_variant_sku_detail(
+    variant_sku: str, parcial: bool = False, db: Session = Depends(get_db)
+):
+    """Obtener una variante por SKU exacto; con parcial=true busca por coincidencia parcial."""
+    if parcial:
+        return PydanticJSONResponse(get_variant_by_sku(db, variant_sku))
+    return PydanticJSONResponse([get_variant_by_exact_sku(db, variant_sku)])
 
 
 # @router.post("/", response_model=VarianteOut, status_code=201, tags=["Variantes"])
@@ -64,7 +138,7 @@ def update_existing_variant(
     _: dict = Depends(is_admin),
 ):
     """Actualizar una variante existente."""
-    return update_variant_by_id(db, variant_id, variant_in)
+    return PydanticJSONResponse(update_variant_by_id(db, variant_id, variant_in))
 
 
 @router.delete("/{variant_id}", status_code=204, tags=["Variantes"])
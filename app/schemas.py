@@ -31,6 +31,16 @@ class CategoryOut(BaseModel):
         from_attributes = True
 
 
+class CategorySummary(BaseModel):
+    """Categoría con el conteo de productos activos y su stock total (salida)"""
+
+    id: int
+    nombre_categoria: str
+    logo_categoria: str
+    productos_activos: int
+    stock_total: int
+
+
 class ProductCreate(BaseModel):
     """Esquema base para la categoria de un producto (Entrada)"""
 
@@ -59,6 +69,9 @@ class ProductOut(BaseModel):
     precio_oferta_producto: Optional[float] = None
     imagen_url_producto: str
     activo: bool
+    stock_total: int = 0
+    variantes_con_stock: int = 0
+    precio_efectivo: Optional[float] = None
     categoria: Optional["CategoryOut"]
     variantes: List["VarianteOut"]
     created_at: datetime
@@ -108,4 +121,22 @@ class VarianteOut(BaseModel):
         from_attributes = True
 
 
+class ProductChanges(BaseModel):
+    """Productos creados/actualizados y eliminados desde una fecha (sincronización incremental)"""
+
+    desde: Optional[datetime]
+    hasta: datetime
+    cambiados: List[ProductOut]
+    eliminados: List[int]
+
+
+class VarianteChanges(BaseModel):
+    """Variantes creadas/actualizadas y eliminadas desde una fecha (sincronización incremental)"""
+
+    desde: Optional[datetime]
+    hasta: datetime
+    cambiados: List[VarianteOut]
+    eliminados: List[int]
+
+
 ProductOut.update_forward_refs()
@@ -0,0 +1,237 @@
+"""Lanzador multi-proceso: carga la app una vez y hace fork de N workers de uvicorn.
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8000
+
+El proceso principal importa ``main`` (modelos, rutas, esquemas) antes del
+fork, así los workers comparten esas páginas de memoria y arrancan sin volver
+a importar. Después abre el socket, crea los workers y los reinicia si
+terminan; SIGTERM/SIGINT se reenvía a todos para un apagado ordenado. Las
+migraciones son un paso de la publicación (``python -m app.migrations``, una
+vez por despliegue, no por réplica); con MIGRATE_ON_START=true se ejecutan en
+el proceso principal antes del fork, útil en desarrollo con una sola réplica.
+
+Cada worker recibe su parte de un presupuesto global de conexiones, de modo
+que sumar workers no multiplica las conexiones a SQL Server ni a Redis:
+
+  - DB_POOL_SIZE = DB_CONNECTION_BUDGET / workers, sin overflow (tope real).
+  - THREADPOOL_LIMIT = DB_POOL_SIZE × THREADS_PER_DB_CONNECTION: las rutas
+    síncronas que aciertan en Redis no ocupan conexión, así que conviene algo
+    más de hilos que conexiones; las que van a la base esperan en el pool
+    (db_pool_checkout_wait_seconds) en lugar de abrir conexiones nuevas.
+  - REDIS_MAX_CONNECTIONS = REDIS_CONNECTION_BUDGET / workers / 2 (hay dos
+    pools por worker: texto y binario).
+
+Una variable definida explícitamente en el entorno tiene prioridad sobre el
+valor calculado. Sin METRICS_DIR se usa un directorio temporal de esta
+ejecución (se borra al detenerse), para que /metrics sume todos los workers;
+los ``metrics-*.json`` que queden de una ejecución anterior se borran al arrancar.
+
+Cómo medir el escalado por núcleo: con el mismo Redis y la misma base,
+levantar ``--workers 1, 2, …`` hasta el número de núcleos y medir con un
+generador de carga HTTP externo las rutas servidas desde cache (p. ej.
+``GET /products/{id}``) y las que van a la base. Las primeras deberían crecer
+casi linealmente hasta el número de núcleos; las segundas se estancan cuando
+``db_pool_in_use`` llega a ``db_pool_size`` en todos los workers, y entonces
+lo que limita es el presupuesto de la base, no los workers. En /metrics,
+``threadpool_in_use`` pegado a ``threadpool_size`` indica que faltan hilos.
+
+Requiere fork (Linux/macOS); en Windows usar ``uvicorn main:app``.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "40"))
+REDIS_CONNECTION_BUDGET = int(os.getenv("REDIS_CONNECTION_BUDGET", "200"))
+THREADS_PER_DB_CONNECTION = float(os.getenv("THREADS_PER_DB_CONNECTION", "2"))
+# Conexiones de Redis que cada worker usa fuera del threadpool (suscriptor de
+# eventos, mantenimiento del cache, reconstrucción del snapshot)
+REDIS_BACKGROUND_CONNECTIONS = 3
+# Opcional, como AUTO_MIGRATE: migrar una vez en el proceso principal antes del fork
+MIGRATE_ON_START = os.getenv("MIGRATE_ON_START", "false").lower() == "true"
+# Espera mínima entre reinicios de un worker caído (evita un bucle de forks)
+RESPAWN_DELAY = 1.0
+
+
+def worker_limits(
+    workers: int,
+    db_budget: int = DB_CONNECTION_BUDGET,
+    redis_budget: int = REDIS_CONNECTION_BUDGET,
+    threads_per_connection: float = THREADS_PER_DB_CONNECTION,
+) -> Dict[str, int]:
+    """Tamaños por worker derivados del presupuesto global de conexiones."""
+    db_pool = max(1, db_budget // workers)
+    threads = max(1, int(db_pool * threads_per_connection))
+    redis_pool = max(1, redis_budget // workers // 2)
+    if redis_pool < threads + REDIS_BACKGROUND_CONNECTIONS:
+        logger.warning(
+            "REDIS_CONNECTION_BUDGET=%s alcanza para %s conexiones por pool y "
+            "worker, menos que los %s hilos: habrá esperas por conexión a Redis",
+            redis_budget,
+            redis_pool,
+            threads,
+        )
+    return {
+        "DB_POOL_SIZE": db_pool,
+        "DB_MAX_OVERFLOW": 0,
+        "THREADPOOL_LIMIT": threads,
+        "REDIS_MAX_CONNECTIONS": redis_pool,
+    }
+
+
+def _spawn(config, sockets: List) -> int:
+    """Crea un worker que atiende los sockets ya abiertos por el proceso principal."""
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Hijo: sin conexiones heredadas del padre y con las señales por defecto
+    # (uvicorn instala las suyas para el apagado ordenado)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from app.database import engine  # pylint: disable=import-outside-toplevel
+
+    engine.dispose(close=False)
+    import uvicorn  # pylint: disable=import-outside-toplevel
+
+    code = 0
+    try:
+        uvicorn.Server(config).run(sockets=sockets)
+    except BaseException:  # pylint: disable=broad-except
+        logger.exception("Worker %s terminó con error", os.getpid())
+        code = 1
+    finally:
+        os._exit(code)  # pylint: disable=protected-access
+
+
+def serve(host: str, port: int, workers: int, proxy_headers: bool = True) -> None:
+    """Precarga la app, abre el socket y supervisa ``workers`` procesos."""
+    for name, value in worker_limits(workers).items():
+        os.environ.setdefault(name, str(value))
+    # /metrics suma los archivos de todos los workers; sin un directorio propio
+    # de esta ejecución cada worker respondería solo con sus números
+    own_metrics_dir = "METRICS_DIR" not in os.environ
+    if own_metrics_dir:
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+    logger.info(
+        "Servidor › %s workers; por worker: pool DB %s (+%s), %s hilos, Redis %s por pool",
+        workers,
+        os.environ["DB_POOL_SIZE"],
+        os.environ["DB_MAX_OVERFLOW"],
+        os.environ["THREADPOOL_LIMIT"],
+        os.environ["REDIS_MAX_CONNECTIONS"],
+    )
+
+    # Precarga: los módulos leen la configuración de arriba al importarse
+    import uvicorn  # pylint: disable=import-outside-toplevel
+    from main import app  # pylint: disable=import-outside-toplevel
+    from app.database import engine  # pylint: disable=import-outside-toplevel
+    from app import metrics  # pylint: disable=import-outside-toplevel
+
+    # Los contadores de una ejecución anterior (o de PIDs ya reciclados) no se suman
+    metrics.clear()
+
+    if MIGRATE_ON_START:
+        from app.migrations import migrate  # pylint: disable=import-outside-toplevel
+
+        migrate()
+        # Los workers no deben heredar las conexiones usadas por la migración
+        engine.dispose()
+
+    config = uvicorn.Config(app, host=host, port=port, proxy_headers=proxy_headers)
+    sockets = [config.bind_socket()]
+    # Los objetos de la precarga no se recorren en los GC de los hijos (menos copy-on-write)
+    gc.freeze()
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def _stop(signum, _frame) -> None:
+        nonlocal stopping
+        # La segunda señal corta sin esperar el apagado ordenado
+        sig = signal.SIGKILL if stopping else signal.SIGTERM
+        stopping = True
+        logger.info("Servidor › señal %s, deteniendo %s workers", signum, len(children))
+        for pid in list(children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    for _ in range(workers):
+        children[_spawn(config, sockets)] = time.monotonic()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        logger.warning(
+            "Servidor › worker %s terminó (código %s), se reinicia",
+            pid,
+            os.waitstatus_to_exitcode(status),
+        )
+        time.sleep(max(0.0, RESPAWN_DELAY - (time.monotonic() - started)))
+        if not stopping:
+            children[_spawn(config, sockets)] = time.monotonic()
+
+    for sock in sockets:
+        sock.close()
+    if own_metrics_dir:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    logger.info("Servidor › detenido")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada del servidor."""
+    parser = argparse.ArgumentParser(
+        prog="python -m app.server",
+        description="Sirve main:app con varios workers precargados.",
+    )
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WEB_CONCURRENCY,
+        help="procesos (por defecto WEB_CONCURRENCY o la cantidad de núcleos)",
+    )
+    parser.add_argument(
+        "--no-proxy-headers",
+        dest="proxy_headers",
+        action="store_false",
+        help="ignorar X-Forwarded-For/Proto",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s › %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if not hasattr(os, "fork"):
+        logger.error("Este lanzador requiere fork; en Windows usar uvicorn main:app")
+        return 1
+    serve(args.host, args.port, max(1, args.workers), args.proxy_headers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Utilidades para pruebas de la API (no se usan en producción)."""
+
+from typing import Optional
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+from app.querylog import capture_queries
+
+
+def declared_budget(app, method: str, path: str) -> Optional[int]:
+    """Presupuesto de consultas declarado con ``query_budget`` en la ruta que atiende ``path``."""
+    scope = {"type": "http", "method": method.upper(), "path": path}
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.matches(scope)[0] == Match.FULL:
+            for dependency in route.dependant.dependencies:
+                budget = getattr(dependency.call, "budget", None)
+                if budget is not None:
+                    return budget
+            return None
+    return None
+
+
+def assert_query_budget(
+    client, method: str, url: str, budget: Optional[int] = None, **kwargs
+):
+    """
+    Hace la solicitud con el TestClient y falla si ejecutó más consultas que
+    ``budget`` (o, si no se indica, que el presupuesto declarado en la ruta).
+    Devuelve la respuesta para seguir verificándola.
+    """
+    path = url.split("?", 1)[0]
+    if budget is None:
+        budget = declared_budget(client.app, method, path)
+        if budget is None:
+            raise AssertionError(f"{method} {path} no declara query_budget")
+
+    with capture_queries() as captured:
+        response = client.request(method, url, **kwargs)
+    assert captured, f"{method} {url} no pasó por QueryBudgetMiddleware"
+    stats = captured[-1]
+    if stats.count > budget:
+        detail = "\n  ".join(stats.statements)
+        raise AssertionError(
+            f"{method} {url} ejecutó {stats.count} consultas "
+            f"(presupuesto {budget}, {stats.seconds * 1000:.1f} ms):\n  {detail}"
+        )
+    return response
@@ -0,0 +1,136 @@
+"""Desglose por solicitud del tiempo en base de datos, Redis y serialización (Server-Timing).
+
+Con SERVER_TIMING=true, ``ServerTimingMiddleware`` abre un acumulador por
+solicitud (ContextVar, que también ven los hilos del threadpool) y los puntos
+instrumentados suman su duración en una categoría:
+
+  - db:            cada sentencia SQL (lo registra app.querylog).
+  - redis:         cada llamada que pasa por el circuit breaker.
+  - validacion:    JSON del cache -> modelos Pydantic.
+  - serializacion: modelos -> JSON de la respuesta.
+
+El resultado sale en el encabezado ``Server-Timing`` y en una línea de log JSON.
+Deshabilitado, el middleware no se instala y ``timed`` devuelve un contexto vacío.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# categoría -> [segundos acumulados, cantidad de llamadas]
+_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "server_timing", default=None
+)
+_NULL = nullcontext()
+
+
+class _Timer:
+    """Suma la duración del bloque a una categoría del acumulador."""
+
+    __slots__ = ("acc", "category", "start")
+
+    def __init__(self, acc: Dict[str, List[float]], category: str):
+        self.acc = acc
+        self.category = category
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        _add(self.acc, self.category, time.perf_counter() - self.start)
+
+
+def _add(acc: Dict[str, List[float]], category: str, seconds: float) -> None:
+    entry = acc.get(category)
+    if entry is None:
+        acc[category] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def record(category: str, seconds: float) -> None:
+    """Suma ``seconds`` a la categoría de la solicitud actual (si se está midiendo)."""
+    acc = _timings.get()
+    if acc is not None:
+        _add(acc, category, seconds)
+
+
+def timed(category: str):
+    """Contexto que mide el bloque en ``category``; vacío si no se está midiendo."""
+    acc = _timings.get()
+    if acc is None:
+        return _NULL
+    return _Timer(acc, category)
+
+
+def format_server_timing(acc: Dict[str, List[float]], total: float) -> str:
+    """Arma el valor del encabezado Server-Timing (duraciones en ms)."""
+    parts = [
+        f'{name};dur={seconds * 1000:.2f};desc="{int(count)}x"'
+        for name, (seconds, count) in acc.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """Abre el acumulador por solicitud y publica el desglose en encabezado y log."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        acc: Dict[str, List[float]] = {}
+        token = _timings.set(acc)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    format_server_timing(acc, time.perf_counter() - start),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            total = time.perf_counter() - start
+            logger.info(
+                "Server-Timing %s",
+                json.dumps(
+                    {
+                        "metodo": scope["method"],
+                        "ruta": scope["path"],
+                        "status": status,
+                        "total_ms": round(total * 1000, 2),
+                        **{
+                            f"{name}_ms": round(seconds * 1000, 2)
+                            for name, (seconds, _) in acc.items()
+                        },
+                        **{f"{name}_n": int(count) for name, (_, count) in acc.items()},
+                    }
+                ),
+            )
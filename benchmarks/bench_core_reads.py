@@ -0,0 +1,121 @@
+"""Benchmark: costo de CPU por fila del listado ORM + model_validate vs. lectura Core.
+
+Uso:
+    python -m benchmarks.bench_core_reads --products 2000 --variants 4 --repeat 5
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from app.models import Base, Categoria, Producto, VarianteProducto
+from app.schemas import CategoryOut, ProductOut, VarianteOut
+from app.functions.core_reads import fetch_categories, fetch_products, fetch_variants
+
+
+def seed(engine, n_products: int, n_variants: int, n_categories: int = 20) -> None:
+    """Llena una base SQLite en memoria con un catálogo sintético."""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Categoria),
+            [
+                {"id": i, "nombre_categoria": f"cat-{i}", "logo_categoria": "logo.png"}
+                for i in range(1, n_categories + 1)
+            ],
+        )
+        conn.execute(
+            insert(Producto),
+            [
+                {
+                    "id": i,
+                    "nombre_producto": f"producto-{i}",
+                    "descripcion_producto": "descripcion",
+                    "precio_producto": 10.0 + i,
+                    "precio_oferta_producto": None,
+                    "imagen_url_producto": "img.png",
+                    "activo": True,
+                    "categoria_id": i % n_categories + 1,
+                    "created_at": now,
+                }
+                for i in range(1, n_products + 1)
+            ],
+        )
+        conn.execute(
+            insert(VarianteProducto),
+            [
+                {
+                    "talla": f"T{v}",
+                    "color": "NEGRO",
+                    "stock_variante_producto": v,
+                    "sku": f"P{p}-NEG-T{v}",
+                    "producto_id": p,
+                    "created_at": now,
+                }
+                for p in range(1, n_products + 1)
+                for v in range(n_variants)
+            ],
+        )
+
+
+def best_of(fn, repeat: int) -> float:
+    """Mejor tiempo de CPU (segundos) de ``repeat`` ejecuciones."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main() -> None:
+    """Ejecuta el benchmark e imprime microsegundos de CPU por fila."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--variants", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    seed(engine, args.products, args.variants)
+
+    cases = [
+        (
+            "categorias",
+            lambda db: [CategoryOut.model_validate(c) for c in db.query(Categoria)],
+            fetch_categories,
+        ),
+        (
+            "variantes",
+            lambda db: [
+                VarianteOut.model_validate(v) for v in db.query(VarianteProducto)
+            ],
+            fetch_variants,
+        ),
+        (
+            "productos",
+            lambda db: [ProductOut.model_validate(p) for p in db.query(Producto)],
+            fetch_products,
+        ),
+    ]
+
+    print(f"{'recurso':<12}{'filas':>8}{'orm us/fila':>14}{'core us/fila':>14}{'x':>7}")
+    for name, orm_read, core_read in cases:
+
+        def run(read):
+            with Session(engine) as db:
+                return read(db)
+
+        rows = len(run(core_read))
+        orm_t = best_of(lambda: run(orm_read), args.repeat)
+        core_t = best_of(lambda: run(core_read), args.repeat)
+        print(
+            f"{name:<12}{rows:>8}{orm_t / rows * 1e6:>14.1f}"
+            f"{core_t / rows * 1e6:>14.1f}{orm_t / core_t:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
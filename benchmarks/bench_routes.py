@@ -0,0 +1,365 @@
+"""Benchmark de rutas: latencia p50/p99 y solicitudes por segundo de main:app.
+
+Levanta la app en proceso (ASGI, sin red) contra una base SQLite temporal y un
+Redis local: fakeredis por defecto o un Redis real con --redis-url. Siembra un
+catálogo sintético y mide cada ruta en tres escenarios:
+
+  - frio:   se vacía Redis antes de cada solicitud (camino de base de datos).
+  - tibio:  cache precalentado, solicitudes concurrentes.
+  - mixto:  lecturas concurrentes con un porcentaje de escrituras que invalidan.
+
+Requiere las dependencias de desarrollo (httpx y fakeredis con Lua):
+
+    pip install -r requirements-dev.txt
+
+Los resultados se guardan en JSON (con el commit actual) para compararlos:
+
+    python -m benchmarks.bench_routes --products 1000 --variants 4
+    python -m benchmarks.bench_routes --products 100000 --requests 500
+    python -m benchmarks.bench_routes --compare benchmarks/results/<anterior>.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# (nombre, función que arma la URL a partir del generador aleatorio y la escala)
+Route = Tuple[str, Callable[[random.Random, int, int], str]]
+
+
+def _batch_url(rng: random.Random, products: int, _: int) -> str:
+    return "/products/batch?" + "&".join(
+        f"ids={rng.randint(1, products)}" for _ in range(10)
+    )
+
+
+def _sku_url(rng: random.Random, products: int, variants: int) -> str:
+    return f"/variants/P{rng.randint(1, products)}-NEG-T{rng.randrange(variants)}"
+
+
+READ_ROUTES: List[Route] = [
+    ("GET /products/", lambda rng, p, v: "/products/"),
+    ("GET /products/{id}", lambda rng, p, v: f"/products/{rng.randint(1, p)}"),
+    ("GET /products/batch", _batch_url),
+    (
+        "GET /products/search",
+        lambda rng, p, v: f"/products/search?nombre=producto-{rng.randint(1, p)}",
+    ),
+    ("GET /products/?en_stock", lambda rng, p, v: "/products/?en_stock=true"),
+    ("GET /category/", lambda rng, p, v: "/category/"),
+    ("GET /category/summary", lambda rng, p, v: "/category/summary"),
+    ("GET /variants/", lambda rng, p, v: "/variants/"),
+    ("GET /variants/{sku}", _sku_url),
+    (
+        "GET /variants/search",
+        lambda rng, p, v: f"/variants/search?variant_id={rng.randint(1, p * v)}",
+    ),
+]
+
+
+def git_commit() -> str:
+    """Commit actual (o 'desconocido' fuera de un repositorio git)."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def summarize(latencies: List[float], wall: float) -> Dict[str, float]:
+    """p50/p99 en milisegundos y solicitudes por segundo."""
+    ordered = sorted(latencies)
+    p99_index = min(len(ordered) - 1, int(len(ordered) * 0.99))
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[p99_index] * 1000, 3),
+        "rps": round(len(ordered) / wall, 1) if wall else 0.0,
+    }
+
+
+def setup_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Configura las variables de entorno antes de importar la app."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    os.environ["FIREBASE_CREDENTIALS_PATH"] = ""
+    os.environ.pop("CATALOG_SNAPSHOT_DIR", None)
+    if not args.admision:
+        # Se mide el costo de las rutas: sin límites de tasa ni de concurrencia
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        os.environ["ADMISSION_SEARCH_CONCURRENCY"] = "0"
+        os.environ["ADMISSION_LIST_CONCURRENCY"] = "0"
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+        os.environ.setdefault("REDIS_SSL", "false")
+    else:
+        os.environ["REDIS_URL"] = "redis://localhost:6379/0"
+
+
+def use_fake_redis():
+    """Reemplaza los clientes Redis por fakeredis (debe llamarse antes de importar app.cache)."""
+    import fakeredis  # pylint: disable=import-outside-toplevel
+    import app.cache.admin as admin  # pylint: disable=import-outside-toplevel
+
+    server = fakeredis.FakeServer()
+    admin.redis_connection = fakeredis.FakeRedis(server=server, decode_responses=True)
+    admin.redis_binary = fakeredis.FakeRedis(server=server)
+    try:
+        admin.redis_connection.eval("return 1", 0)
+    except Exception:  # pylint: disable=broad-except
+        print("⚠️ fakeredis sin soporte Lua (pip install -r requirements-dev.txt):")
+        print("   los ajustes del resumen por categoría fallarán en el escenario mixto")
+    return admin.redis_connection
+
+
+def check_response(label: str, response) -> None:
+    """Falla ante errores y rechazos de admisión (429/503): no son latencias válidas."""
+    if response.status_code >= 500 or response.status_code == 429:
+        raise RuntimeError(f"{label} -> {response.status_code}")
+
+
+async def run_requests(
+    client, urls: List[str], concurrency: int
+) -> Tuple[List[float], float]:
+    """Ejecuta GETs con ``concurrency`` tareas y devuelve latencias y tiempo total."""
+    queue = list(reversed(urls))
+    latencies: List[float] = []
+
+    async def worker():
+        while queue:
+            url = queue.pop()
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            check_response(url, response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def scenario_cold(client, redis, args, rng) -> Dict[str, dict]:
+    """Cada solicitud con Redis vacío: mide el camino completo a la base de datos."""
+    results = {}
+    n = max(1, args.requests // 10)
+    for name, make_url in READ_ROUTES:
+        latencies = []
+        for _ in range(n):
+            redis.flushall()
+            url = make_url(rng, args.products, args.variants)
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            check_response(url, response)
+        results[name] = summarize(latencies, sum(latencies))
+    return results
+
+
+async def scenario_warm(client, redis, args, rng) -> Dict[str, dict]:
+    """Cache precalentado con las mismas URLs que luego se miden en paralelo."""
+    results = {}
+    redis.flushall()
+    for name, make_url in READ_ROUTES:
+        urls = [
+            make_url(rng, args.products, args.variants) for _ in range(args.requests)
+        ]
+        for url in set(urls):
+            await client.get(url)
+        latencies, wall = await run_requests(client, urls, args.concurrency)
+        results[name] = summarize(latencies, wall)
+    return results
+
+
+async def scenario_mixed(client, redis, args, rng) -> Dict[str, dict]:
+    """Lecturas de todas las rutas con un porcentaje de escrituras de stock y precio."""
+    redis.flushall()
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    total = args.requests * len(READ_ROUTES)
+    ops = []
+    for _ in range(total):
+        if rng.random() < args.write_ratio:
+            if rng.random() < 0.5:
+                ops.append(
+                    (
+                        "PUT /variants/{id}",
+                        rng.randint(1, args.products * args.variants),
+                    )
+                )
+            else:
+                ops.append(("PUT /products/{id}", rng.randint(1, args.products)))
+        else:
+            name, make_url = rng.choice(READ_ROUTES)
+            ops.append((name, make_url(rng, args.products, args.variants)))
+    ops.reverse()
+
+    async def execute(name, target):
+        if name == "PUT /variants/{id}":
+            # las variantes se sembraron en orden: id -> talla T{(id - 1) % variantes}
+            payload = {
+                "color": "NEGRO",
+                "talla": f"T{(target - 1) % args.variants}",
+                "stock_variante_producto": rng.randint(0, 20),
+            }
+            return await client.put(f"/variants/{target}", json=payload)
+        if name == "PUT /products/{id}":
+            payload = {
+                "nombre_producto": f"producto-{target}",
+                "descripcion_producto": "descripcion",
+                "precio_producto": round(rng.uniform(5, 500), 2),
+                "imagen_url_producto": "img.png",
+                "categoria_id": target % 20 + 1,
+            }
+            return await client.put(f"/products/{target}", json=payload)
+        return await client.get(target)
+
+    async def worker():
+        while ops:
+            name, target = ops.pop()
+            start = time.perf_counter()
+            response = await execute(name, target)
+            latencies[name].append(time.perf_counter() - start)
+            check_response(name, response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - start
+    results = {name: summarize(values, wall) for name, values in latencies.items()}
+    results["TOTAL"] = summarize([x for v in latencies.values() for x in v], wall)
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, dict]], baseline: dict = None) -> None:
+    """Tabla por escenario; con baseline muestra la variación porcentual de p50 y rps."""
+    for scenario, routes in results.items():
+        print(f"\n== {scenario} ==")
+        print(f"{'ruta':<26}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+        for name, stats in routes.items():
+            line = (
+                f"{name:<26}{stats['n']:>7}{stats['p50_ms']:>10.2f}"
+                f"{stats['p99_ms']:>10.2f}{stats['rps']:>10.1f}"
+            )
+            old = (baseline or {}).get(scenario, {}).get(name)
+            if old and old["p50_ms"] and old["rps"]:
+                p50 = (stats["p50_ms"] / old["p50_ms"] - 1) * 100
+                rps = (stats["rps"] / old["rps"] - 1) * 100
+                line += f"   p50 {p50:+.0f}%  rps {rps:+.0f}%"
+            print(line)
+
+
+def main() -> None:
+    """Siembra, ejecuta los escenarios y guarda los resultados."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--variants", type=int, default=4)
+    parser.add_argument(
+        "--requests", type=int, default=1000, help="solicitudes por ruta"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--scenarios", default="frio,tibio,mixto")
+    parser.add_argument("--redis-url", help="Redis real en lugar de fakeredis")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--admision",
+        action="store_true",
+        help="mantener los límites de tasa y concurrencia (los rechazos fallan la corrida)",
+    )
+    parser.add_argument("--output", help="archivo JSON de salida")
+    parser.add_argument("--compare", help="resultado anterior para comparar")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    setup_environment(args, workdir)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # pylint: disable=import-outside-toplevel
+    if args.redis_url:
+        from app.cache.admin import redis_connection as redis
+    else:
+        redis = use_fake_redis()
+    import httpx
+    from app.auth.security import is_admin
+    from app.database import engine
+    from app.migrations import backfill_product_aggregates
+    from app.models import Base
+    from benchmarks.bench_core_reads import seed
+    import main as server
+
+    logging.disable(logging.WARNING)
+    engine.echo = False
+    Base.metadata.create_all(engine)
+    start = time.perf_counter()
+    seed(engine, args.products, args.variants)
+    backfill_product_aggregates(engine)
+    print(
+        f"Catálogo sembrado en {time.perf_counter() - start:.1f} s "
+        f"({args.products} productos × {args.variants} variantes)"
+    )
+
+    server.app.dependency_overrides[is_admin] = lambda: {"email": "bench"}
+    scenarios = {
+        "frio": scenario_cold,
+        "tibio": scenario_warm,
+        "mixto": scenario_mixed,
+    }
+
+    async def run() -> Dict[str, Dict[str, dict]]:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            results = {}
+            for name in args.scenarios.split(","):
+                rng = random.Random(args.seed)
+                results[name] = await scenarios[name](client, redis, args, rng)
+            return results
+
+    results = asyncio.run(run())
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{commit}.json",
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "fecha": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "parametros": vars(args),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nResultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
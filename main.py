@@ -1,11 +1,33 @@
 """Archivo inicial, Sercvicio de la API RESTful para el manejo de la base de datos"""
 
+import asyncio
 import logging
-from sqlalchemy import inspect
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from anyio import to_thread
 from fastapi import FastAPI
+from app.auth.auth import init_firebase
+from app.cache.admin import ping_redis
+from app.cache.events import event_hub
+from app.cache.maintenance import cache_maintenance
+from app.cache.snapshot import catalog_snapshot
+from app.conditional import ConditionalGetMiddleware
+from app.cache.cache_utils import redis_breaker
 from app.database import engine
-from app.routers import route_category, route_products, route_variants
-from app.models import Base
+from app.metrics import MetricsMiddleware, register_pool_gauges, registry, start_flusher
+from app.idempotency import IdempotencyMiddleware
+from app.querylog import QueryBudgetMiddleware
+from app.timing import SERVER_TIMING, ServerTimingMiddleware
+from app.migrations import migrate
+from app.routers import (
+    route_category,
+    route_events,
+    route_metrics,
+    route_products,
+    route_variants,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,18 +38,69 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "5"))
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() == "true"
+# Hilos para las rutas síncronas (0 = valor de anyio, 40); app.server lo alinea con el pool
+THREADPOOL_LIMIT = int(os.getenv("THREADPOOL_LIMIT", "0"))
+
+
+async def run_startup_phase(name: str, func) -> None:
+    """Ejecuta una fase de arranque en un hilo, con timeout y registro de su duración."""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(asyncio.to_thread(func), timeout=STARTUP_TIMEOUT)
+        logger.info(
+            "Arranque › %s listo en %.0f ms", name, (time.perf_counter() - start) * 1000
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Arranque › %s superó %.1f s, continúa", name, STARTUP_TIMEOUT)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Arranque › %s falló, continúa", name)
+
 
-inspector = inspect(engine)
-tables = set(inspector.get_table_names())
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Inicializa Firebase, Redis y (opcionalmente) las migraciones en paralelo."""
+    phases = [
+        ("firebase", partial(init_firebase, timeout=STARTUP_TIMEOUT)),
+        ("redis", ping_redis),
+    ]
+    if AUTO_MIGRATE:
+        phases.append(("migraciones", migrate))
+    if catalog_snapshot.enabled:
+        phases.append(("snapshot", catalog_snapshot.ensure))
 
-for name, table in Base.metadata.tables.items():
-    if name in tables:
-        logger.info("Ya existe... se Omite : %s", name)
-    else:
-        logger.info("Creando tabla: %s", name)
-        table.create(bind=engine)
+    start = time.perf_counter()
+    await asyncio.gather(*(run_startup_phase(name, func) for name, func in phases))
+    logger.info("Arranque completo en %.0f ms", (time.perf_counter() - start) * 1000)
 
-app = FastAPI(title="API de Servicio de productos", version="1.0.0")
+    limiter = to_thread.current_default_thread_limiter()
+    if THREADPOOL_LIMIT > 0:
+        limiter.total_tokens = THREADPOOL_LIMIT
+    registry.gauge("threadpool_in_use", lambda: {"": limiter.borrowed_tokens})
+    registry.gauge("threadpool_size", lambda: {"": limiter.total_tokens})
+
+    event_hub.start(asyncio.get_running_loop())
+    cache_maintenance.start()
+    start_flusher()
+    yield
+    event_hub.stop()
+    await asyncio.to_thread(cache_maintenance.stop)
+
+
+app = FastAPI(title="API de Servicio de productos", version="1.0.0", lifespan=lifespan)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(QueryBudgetMiddleware)
+if SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+register_pool_gauges(engine)
+registry.gauge(
+    "redis_breaker_open",
+    lambda: {"": int(redis_breaker.snapshot()["state"] != "closed")},
+)
 
 app.include_router(
     route_category.router,
@@ -49,3 +122,15 @@ app.include_router(
     tags=["Products"],
     responses={404: {"description": "No encontrado"}},
 )
+
+app.include_router(
+    route_events.router,
+    prefix="/events",
+    tags=["Events"],
+)
+
+app.include_router(
+    route_metrics.router,
+    prefix="/metrics",
+    tags=["Metrics"],
+)
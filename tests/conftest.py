@@ -0,0 +1,72 @@
+"""Entorno de pruebas: SQLite temporal y fakeredis en lugar de SQL Server y Redis.
+
+Las variables de entorno y los clientes Redis se reemplazan antes de importar la
+app, igual que en benchmarks/bench_routes.py.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix="tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'tests.sqlite')}"
+os.environ["FIREBASE_CREDENTIALS_PATH"] = ""
+os.environ["REDIS_URL"] = "redis://localhost:6379/0"
+os.environ["REDIS_SSL"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ.pop("CATALOG_SNAPSHOT_DIR", None)
+
+import fakeredis  # noqa: E402  pylint: disable=wrong-import-position
+import app.cache.admin as admin  # noqa: E402  pylint: disable=wrong-import-position
+
+_server = fakeredis.FakeServer()
+admin.redis_connection = fakeredis.FakeRedis(server=_server, decode_responses=True)
+admin.redis_binary = fakeredis.FakeRedis(server=_server)
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from fastapi.testclient import TestClient  # noqa: E402
+from app.auth.security import is_admin  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.models import Base  # noqa: E402
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente de la app con un catálogo mínimo y un administrador simulado."""
+    Base.metadata.create_all(engine)
+    main.app.dependency_overrides[is_admin] = lambda: {"email": "admin@test"}
+    with TestClient(main.app) as test_client:
+        _seed(test_client)
+        yield test_client
+    main.app.dependency_overrides.clear()
+    engine.dispose()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def redis():
+    """Redis en memoria vacío al empezar cada prueba (se mide el camino a la base)."""
+    admin.redis_connection.flushall()
+    return admin.redis_connection
+
+
+def _seed(test_client: TestClient) -> None:
+    categoria = {"nombre_categoria": "Ropa", "logo_categoria": "ropa.png"}
+    assert test_client.post("/category/", json=categoria).status_code == 201
+    for n in range(1, 4):
+        producto = {
+            "nombre_producto": f"Producto {n}",
+            "descripcion_producto": "Descripción",
+            "precio_producto": 10 * n,
+            "imagen_url_producto": f"producto-{n}.png",
+            "categoria_id": 1,
+            "variantes": [
+                {"color": "rojo", "talla": "M", "stock_variante_producto": n},
+                {"color": "azul", "talla": "S", "stock_variante_producto": 0},
+            ],
+        }
+        response = test_client.post("/products/", json=producto)
+        assert response.status_code == 201, response.text
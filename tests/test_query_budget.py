@@ -0,0 +1,45 @@
+"""Presupuesto de consultas de las rutas de lectura con el cache vacío."""
+
+import pytest
+
+from app.testing import assert_query_budget
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/products/",
+        "/products/1",
+        "/products/batch?ids=3&ids=1&ids=2",
+        "/products/changes",
+        "/variants/",
+        "/variants/changes",
+    ],
+)
+def test_read_routes_within_budget(client, redis, url):
+    response = assert_query_budget(client, "GET", url)
+    assert response.status_code == 200, response.text
+
+
+def test_batch_keeps_requested_order(client, redis):
+    response = assert_query_budget(client, "GET", "/products/batch?ids=3&ids=1")
+    assert [p["id"] for p in response.json()] == [3, 1]
+
+
+def test_changes_since_last_sync_within_budget(client, redis):
+    hasta = assert_query_budget(client, "GET", "/products/changes").json()["hasta"]
+    response = assert_query_budget(
+        client, "GET", "/products/changes", params={"desde": hasta}
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_cached_reads_do_not_query(client, redis):
+    client.get("/products/1")
+    assert_query_budget(client, "GET", "/products/1", budget=0)
+
+
+def test_empty_filtered_list_is_cached(client, redis):
+    url = "/products/?precio_min=100000"
+    assert assert_query_budget(client, "GET", url).json() == []
+    assert_query_budget(client, "GET", url, budget=0)